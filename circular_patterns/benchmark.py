@@ -0,0 +1,169 @@
+"""Benchmark of the circular patterns renderers.
+
+Times each element type's ``render()`` across radii and unit lengths, and ``make_drawing()``
+end to end across letter counts, along with the number of points emitted. Results can be saved
+as JSON and compared with a previous run (e.g. from another commit).
+
+Usage:
+
+    python benchmark.py [--output results.json] [--compare previous.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+import vpype as vp
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+
+from sketch_circular_patterns import ALPHABET, make_drawing
+
+RADII = (1.0, 3.0, 6.0, 10.0)
+UNIT_LENGTHS = (0.1, 0.3, 0.6)
+LETTER_COUNTS = (50, 100, 200, 400, 800)
+
+# letters used by the sketch, all with the same (default) probability
+LETTERS = "+-Oo^v \n" + "".join(ALPHABET)
+
+
+def point_count(lc: vp.LineCollection) -> int:
+    return sum(len(line) for line in lc)
+
+
+def time_call(func, repeat: int) -> tuple[float, object]:
+    """Best time of a call over repeat runs, along with its result."""
+    result = func()
+    number = max(1, int(0.05 / max(timeit.timeit(func, number=1), 1e-6)))
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    return best, result
+
+
+def bench_elems(repeat: int) -> list[dict]:
+    results = []
+    for letter, elem_class in ALPHABET.items():
+        for radius in RADII:
+            for unit_length in UNIT_LENGTHS:
+                # noinspection PyArgumentList
+                elem = elem_class(
+                    radius=radius,
+                    dr=0.8,
+                    start_angle=0,
+                    stop_angle=90,
+                    unit_length=unit_length,
+                )
+                t, lc = time_call(elem.render, repeat)
+                results.append(
+                    {
+                        "elem": elem_class.__name__,
+                        "letter": letter,
+                        "radius": radius,
+                        "unit_length": unit_length,
+                        "time": t,
+                        "lines": len(lc),
+                        "points": point_count(lc),
+                    }
+                )
+    return results
+
+
+def bench_drawings(repeat: int, seed: int) -> list[dict]:
+    results = []
+    for letter_count in LETTER_COUNTS:
+        rng = random.Random(seed)
+        drawing = "".join(rng.choices(LETTERS, k=letter_count))
+
+        def _make_drawing():
+            np.random.seed(seed)
+            return make_drawing(drawing)
+
+        t, lc = time_call(_make_drawing, repeat)
+        results.append(
+            {
+                "letter_count": letter_count,
+                "time": t,
+                "lines": len(lc),
+                "points": point_count(lc),
+            }
+        )
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=pathlib.Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: dict) -> tuple:
+    return tuple(v for k, v in result.items() if k not in ("time", "lines", "points"))
+
+
+def print_results(results: dict, previous: dict | None) -> None:
+    def _compare(section: str, result: dict) -> str:
+        if previous is None:
+            return ""
+        old = {_key(r): r for r in previous.get(section, [])}.get(_key(result))
+        if old is None:
+            return ""
+        return f"  {old['time'] / result['time']:5.2f}x  (was {old['points']} points)"
+
+    print(
+        f"{'elem':14s} {'radius':>6s} {'unit':>5s} {'time':>10s} {'lines':>6s} {'points':>7s}"
+    )
+    for r in results["elems"]:
+        print(
+            f"{r['elem']:14s} {r['radius']:6.1f} {r['unit_length']:5.2f} "
+            f"{r['time'] * 1e3:8.3f}ms {r['lines']:6d} {r['points']:7d}" + _compare("elems", r)
+        )
+
+    print()
+    print(f"{'letters':>7s} {'time':>10s} {'lines':>6s} {'points':>7s}")
+    for r in results["drawings"]:
+        print(
+            f"{r['letter_count']:7d} {r['time'] * 1e3:8.3f}ms {r['lines']:6d} {r['points']:7d}"
+            + _compare("drawings", r)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the circular patterns renderers.")
+    parser.add_argument("--output", type=pathlib.Path, help="save the results as JSON")
+    parser.add_argument(
+        "--compare", type=pathlib.Path, help="previous results to compare with"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "vpype": vp.__version__,
+        "elems": bench_elems(args.repeat),
+        "drawings": bench_drawings(args.repeat, args.seed),
+    }
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, previous)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
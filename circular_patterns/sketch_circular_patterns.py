@@ -1,9 +1,12 @@
+import itertools
 import math
 import random
-from typing import Dict, List, Type
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple, Type
 
 import attr
 import axi
+import multiprocess
 import numpy as np
 import vpype as vp
 import vsketch
@@ -34,7 +37,7 @@ class Elem:
     start_angle: float = 0.0
     stop_angle: float = 360.0
     unit_length: float = 1.0
-    quantization: float = 0.1
+    tolerance: float = 0.005  # max chord error of the sampled arcs
 
     def __post_init__(self):
         # normalize angles such that start in is [0, 360] and stop in [0, 720] and greater
@@ -45,9 +48,58 @@ class Elem:
         if self.stop_angle <= self.start_angle:
             self.stop_angle += 360
 
+    @classmethod
+    def from_record(cls, record: np.void, tolerance: float = 0.005) -> "Elem":
+        # noinspection PyArgumentList
+        return cls(
+            radius=float(record["radius"]),
+            dr=float(record["dr"]),
+            start_angle=float(record["start"]),
+            stop_angle=float(record["stop"]),
+            unit_length=float(record["unit_length"]),
+            tolerance=tolerance,
+        )
+
     def render(self) -> vp.LineCollection:
+        return self.elem_to_global_lc(self.render_local())
+
+    def render_local(self) -> vp.LineCollection:
+        """Render in the elem coordinate system"""
         raise NotImplementedError
 
+    @classmethod
+    def render_batch(cls, elems: List["Elem"]) -> List[vp.LineCollection]:
+        """Render several elements of this class, mapping all their lines to their arcs in a
+        single pass"""
+        local_lcs = [elem.render_local() for elem in elems]
+        lines = [line for lc in local_lcs for line in lc]
+        if not lines:
+            return [vp.LineCollection() for _ in elems]
+
+        # per-point copies of each element's parameters
+        counts = [sum(len(line) for line in lc) for lc in local_lcs]
+
+        def _per_point(values):
+            return np.repeat(np.array(values, dtype=float), counts)
+
+        radius = _per_point([elem.radius for elem in elems])
+        start_angle = _per_point([elem.start_angle for elem in elems])
+        angle_diff = _per_point([elem.angle_diff() for elem in elems])
+        width = _per_point([elem.width() for elem in elems])
+        center = _per_point([elem.center_x for elem in elems]) + 1j * _per_point(
+            [elem.center_y for elem in elems]
+        )
+
+        p = np.concatenate(lines)
+        r = radius + p.imag
+        alpha = start_angle + p.real / width * angle_diff
+        alpha *= math.pi / 180.0
+        path = center.real + r * np.cos(-alpha) + 1j * (center.imag + r * np.sin(-alpha))
+
+        mapped = np.split(path, np.cumsum([len(line) for line in lines])[:-1])
+        line_counts = np.cumsum([0] + [len(lc) for lc in local_lcs])
+        return [vp.LineCollection(mapped[a:b]) for a, b in zip(line_counts, line_counts[1:])]
+
     def angle_diff(self):
         """Compute angular difference"""
         return self.stop_angle - self.start_angle
@@ -55,6 +107,18 @@ class Elem:
     def width(self):
         return (self.radius + self.dr / 2) * math.pi / 180 * self.angle_diff()
 
+    def arc_samples(self, y: float, x0: float, x1: float) -> np.ndarray:
+        """Sample the segment (x0, y) -> (x1, y), which maps to an arc, with the fewest points
+        keeping the chord error below tolerance"""
+        r = self.radius + y
+        span = abs(x1 - x0) / self.width() * self.angle_diff() * math.pi / 180
+        if r <= self.tolerance / 2:
+            count = 2
+        else:
+            step = 2 * math.acos(1 - self.tolerance / r)
+            count = max(math.ceil(span / step), 1) + 1
+        return np.linspace(x0, x1, count) + 1j * y
+
     def elem_to_global_coord(self, x, y):
         r = self.radius + y
         alpha = self.start_angle + x / self.width() * (self.stop_angle - self.start_angle)
@@ -67,30 +131,102 @@ class Elem:
         return x + 1j * y
 
     def elem_to_global_lc(self, lc: vp.LineCollection) -> vp.LineCollection:
-        return vp.LineCollection([self.elem_to_global_path(p) for p in lc])
+        """Map all the lines at once, with a single pass over their concatenated points"""
+        if len(lc) == 0:
+            return vp.LineCollection()
+
+        offsets = np.cumsum([len(line) for line in lc])
+        path = self.elem_to_global_path(np.concatenate(lc.lines))
+        return vp.LineCollection(np.split(path, offsets[:-1]))
 
 
 @attr.s
 class SpreadElem(Elem):
-    """Base class for all element that spread items across the arc"""
+    """Base class for all element that spread items across the arc
+
+    Items are instances of template geometries, which are placed all at once.
+    """
 
     def render(self) -> vp.LineCollection:
-        w = self.width()
-        n = math.ceil(w / self.unit_length)
-        lc = vp.LineCollection()
-        for i in range(n):
-            x, y = self.elem_to_global_coord((i / n) * w, self.dr / 2)
-            item_lc = self.render_item(i, n)
-            angle = self.start_angle + (i / n) * (self.stop_angle - self.start_angle) + 90.0
-            item_lc.rotate(-angle * math.pi / 180.0)
-            item_lc.translate(x, y)
-            lc.extend(item_lc)
-        return lc
+        return self.render_batch([self])[0]
+
+    @classmethod
+    def render_batch(cls, elems: List["Elem"]) -> List[vp.LineCollection]:
+        """Render several elements of this class, placing all items of all elements sharing
+        the same template with a single broadcasted operation"""
+        counts = [math.ceil(elem.width() / elem.unit_length) for elem in elems]
+        first_item = np.cumsum([0] + counts)
+        item_count = first_item[-1]
+
+        # per-item element parameters
+        owner = np.repeat(np.arange(len(elems)), counts)
+        n = np.repeat(np.array(counts, dtype=float), counts)
+        i = np.arange(item_count) - first_item[owner]
+
+        def _per_item(values):
+            return np.repeat(np.array(values, dtype=float), counts)
+
+        radius = _per_item([elem.radius + elem.dr / 2 for elem in elems])
+        start_angle = _per_item([elem.start_angle for elem in elems])
+        angle_diff = _per_item([elem.angle_diff() for elem in elems])
+        width = _per_item([elem.width() for elem in elems])
+
+        x = (i / n) * width
+        alpha = start_angle + x / width * angle_diff
+        alpha *= math.pi / 180.0
+        centers = _per_item([elem.center_x for elem in elems]) + radius * np.cos(-alpha)
+        centers = centers + 1j * (
+            _per_item([elem.center_y for elem in elems]) + radius * np.sin(-alpha)
+        )
+        angle = start_angle + (i / n) * angle_diff + 90.0
+        angle *= -math.pi / 180.0
+        rotations = np.cos(angle) + 1j * np.sin(angle)
+
+        # elements with the same template key share their templates
+        template_ids = np.empty(item_count, dtype=int)
+        templates: List[vp.LineCollection] = []
+        template_offsets: Dict[Hashable, int] = {}
+        for k, elem in enumerate(elems):
+            key = elem.template_key()
+            if key not in template_offsets:
+                template_offsets[key] = len(templates)
+                templates.extend(elem.templates())
+            indices = elem.template_indices(counts[k])
+            template_ids[first_item[k] : first_item[k + 1]] = template_offsets[key] + indices
+
+        items: List[List[np.ndarray]] = [[] for _ in range(item_count)]
+        for t, template in enumerate(templates):
+            (selected,) = np.nonzero(template_ids == t)
+            if len(selected) == 0 or len(template) == 0:
+                continue
+
+            offsets = np.cumsum([len(line) for line in template])
+            placed = (
+                np.concatenate(template.lines)[np.newaxis, :] * rotations[selected, np.newaxis]
+                + centers[selected, np.newaxis]
+            )
+            lines = np.split(placed, offsets[:-1], axis=1)
+            for row, item in enumerate(selected):
+                items[item] = [line[row] for line in lines]
+
+        return [
+            vp.LineCollection([line for item_lines in items[a:b] for line in item_lines])
+            for a, b in zip(first_item, first_item[1:])
+        ]
+
+    def template_key(self) -> Hashable:
+        """Elements with equal keys have the same templates"""
+        return type(self), self.unit_length, self.dr
+
+    # noinspection PyMethodMayBeStatic
+    def templates(self) -> List[vp.LineCollection]:
+        """Item geometries, centered around (0, 0)"""
+        return []
 
-    # noinspection PyMethodMayBeStatic,PyUnusedLocal
-    def render_item(self, i: int, n: int) -> vp.LineCollection:
-        """Render a single item, centered around (0, 0)"""
-        return vp.LineCollection()
+    # noinspection PyMethodMayBeStatic
+    def template_indices(self, n: int) -> np.ndarray:
+        """Index of the template used by each of the n items"""
+        return np.zeros(n, dtype=int)
 
 
 DOT_RADIUS = 0.01
@@ -99,43 +235,49 @@ DOT = vp.circle(0, 0, DOT_RADIUS, DOT_RADIUS)
 
 @attr.s
 class DotElem(SpreadElem):
-    def render_item(self, i, n):
-        return vp.LineCollection([DOT])
+    def templates(self):
+        return [vp.LineCollection([DOT])]
 
 
 @attr.s
 class CircleElem(SpreadElem):
-    def render_item(self, i, n):
-        return vp.LineCollection(
-            [vp.circle(0, 0, self.unit_length / 4, self.unit_length / 10)]
-        )
+    def templates(self):
+        return [
+            vp.LineCollection([vp.circle(0, 0, self.unit_length / 4, self.unit_length / 10)])
+        ]
 
 
 @attr.s
 class PlusElem(SpreadElem):
-    def render_item(self, i, n):
+    def templates(self):
         u = self.unit_length
-        return vp.LineCollection([vp.line(-u / 3, 0, u / 3, 0), vp.line(0, -u / 3, 0, u / 3)])
+        return [
+            vp.LineCollection([vp.line(-u / 3, 0, u / 3, 0), vp.line(0, -u / 3, 0, u / 3)])
+        ]
 
 
 @attr.s
 class BarElem(SpreadElem):
-    def render_item(self, i, n):
-        return vp.LineCollection([vp.line(0, -self.dr / 2, 0, self.dr / 2)])
+    def templates(self):
+        return [vp.LineCollection([vp.line(0, -self.dr / 2, 0, self.dr / 2)])]
 
 
 @attr.s
 class DotBarElem(SpreadElem):
-    def render_item(self, i, n):
-        if i % 2 == 0:
-            return vp.LineCollection([vp.line(0, -self.dr / 2, 0, self.dr / 2)])
-        else:
-            return vp.LineCollection([DOT])
+    def templates(self):
+        return [
+            vp.LineCollection([vp.line(0, -self.dr / 2, 0, self.dr / 2)]),
+            vp.LineCollection([DOT]),
+        ]
+
+    def template_indices(self, n):
+        # alternate bars and dots
+        return np.arange(n) % 2
 
 
 @attr.s
 class SpringElem(Elem):
-    def render(self):
+    def render_local(self):
         w = self.width()
         n = math.ceil(w / self.unit_length)
 
@@ -143,25 +285,62 @@ class SpringElem(Elem):
         y = self.dr * np.ones(x.shape)
         y[1::2] = 0
 
-        return vp.LineCollection([self.elem_to_global_path(x + 1j * y)])
+        return vp.LineCollection([x + 1j * y])
 
 
 @attr.s
 class BoxElem(Elem):
-    def render(self):
+    def render_local(self):
         w = self.width()
-        n = max(math.ceil(self.dr / self.quantization), 2)
-        m = max(math.ceil(w / self.quantization), 2)
-        # noinspection PyTypeChecker
+        # sides are radial, thus straight
         p = np.hstack(
             [
-                np.linspace(0, self.dr * 1j, n),
-                np.linspace(self.dr * 1j, self.dr * 1j + w, m),
-                np.linspace(self.dr * 1j + w, w, n),
-                np.linspace(w, 0, m, dtype=complex),
+                np.array([0, self.dr * 1j]),
+                self.arc_samples(self.dr, 0, w),
+                np.array([self.dr * 1j + w, w]),
+                self.arc_samples(0, w, 0),
             ]
         )
-        return vp.LineCollection([self.elem_to_global_path(p)])
+        return vp.LineCollection([p])
+
+
+TEXT_TEMPLATE_CACHE_SIZE = 256
+_text_templates: "OrderedDict[Tuple[str, int, float], Tuple[List, np.ndarray, np.ndarray]]" = (
+    OrderedDict()
+)
+
+
+def text_template(text: str, font: List, unit_length: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Hershey text geometry, centered around (0, 0) and scaled to unit_length height
+
+    Returns the read-only concatenated points of all lines and the lines' end offsets. These
+    are memoized with LRU eviction and shared by all callers.
+    """
+    key = (text, id(font), unit_length)
+    entry = _text_templates.get(key)
+    if entry is not None and entry[0] is font:
+        _text_templates.move_to_end(key)
+        return entry[1], entry[2]
+
+    lc = vp.LineCollection()
+    for line in axi.text(text, font):
+        lc.append([x + 1j * y for x, y in line])
+    if len(lc) == 0:
+        points, offsets = np.empty(0, dtype=complex), np.empty(0, dtype=int)
+    else:
+        x1, y1, x2, y2 = lc.bounds()
+        lc.translate(-(x1 + x2) / 2, -(y1 + y2) / 2)
+        s = unit_length / (y2 - y1)
+        lc.scale(s, -s)
+        points = np.concatenate(lc.lines)
+        offsets = np.cumsum([len(line) for line in lc])
+    points.flags.writeable = False
+    offsets.flags.writeable = False
+
+    _text_templates[key] = (font, points, offsets)
+    if len(_text_templates) > TEXT_TEMPLATE_CACHE_SIZE:
+        _text_templates.popitem(last=False)
+    return points, offsets
 
 
 @attr.s(auto_attribs=True)
@@ -169,46 +348,34 @@ class TextElem(SpreadElem):
     text: str = "A"
     font: List = axi.hershey_fonts.FUTURAM
 
-    def __post_init__(self):
-        super().__post_init__()
-        lines = axi.text(self.text, self.font)
-        self.item_lc = vp.LineCollection()
-        for line in lines:
-            self.item_lc.append([x + 1j * y for x, y in line])
-        x1, y1, x2, y2 = self.item_lc.bounds()
-        self.item_lc.translate(-(x1 + x2) / 2, -(y1 + y2) / 2)
-        s = self.unit_length / (y2 - y1)
-        self.item_lc.scale(s, -s)
+    def template_key(self):
+        return type(self), self.unit_length, self.text, id(self.font)
 
-    def render_item(self, i, n):
-        return vp.LineCollection(self.item_lc)
+    def templates(self):
+        points, offsets = text_template(self.text, self.font, self.unit_length)
+        return [vp.LineCollection(np.split(points, offsets[:-1]))]
 
 
 @attr.s
 class SineElem(Elem):
-    def render(self):
+    def render_local(self):
         n = self.width() / self.unit_length
         t = np.linspace(0, n * 2 * math.pi, int(n * 50))
         return vp.LineCollection(
-            [
-                self.elem_to_global_path(
-                    t / t[-1] * self.width() + 1j * (self.dr / 2 + np.sin(t) * self.dr / 2)
-                )
-            ]
+            [t / t[-1] * self.width() + 1j * (self.dr / 2 + np.sin(t) * self.dr / 2)]
         )
 
 
 @attr.s
 class CarbonElem(Elem):
-    def render(self):
+    def render_local(self):
         w = self.width()
         n = math.ceil(w / self.unit_length)
 
         lc = vp.LineCollection()
         lc.extend(
             [
-                1j * self.dr / 2
-                + np.linspace((i + 0.1) * w / n, (i + 0.9) * w / n, int(w / self.quantization))
+                self.arc_samples(self.dr / 2, (i + 0.1) * w / n, (i + 0.9) * w / n)
                 for i in range(n)
             ]
         )
@@ -221,33 +388,28 @@ class CarbonElem(Elem):
             ]
         )
 
-        return self.elem_to_global_lc(lc)
+        return lc
 
 
 @attr.s
 class LineElem(Elem):
-    def render(self):
+    def render_local(self):
         w = self.width()
-        lc = vp.LineCollection(
-            [np.linspace(0, w, math.ceil(w / self.quantization)) + 1j * self.dr / 2]
-        )
+        lc = vp.LineCollection([self.arc_samples(self.dr / 2, 0, w)])
 
-        return self.elem_to_global_lc(lc)
+        return lc
 
 
 @attr.s(auto_attribs=True)
 class MultiLineElem(Elem):
     line_count: int = 5
 
-    def render(self):
+    def render_local(self):
         w = self.width()
         lc = vp.LineCollection(
-            [
-                np.linspace(h * 1j, w + h * 1j, math.ceil(w / self.quantization))
-                for h in np.linspace(0, self.dr, self.line_count)
-            ]
+            [self.arc_samples(h, 0, w) for h in np.linspace(0, self.dr, self.line_count)]
         )
-        return self.elem_to_global_lc(lc)
+        return lc
 
 
 ALPHABET: Dict[str, Type[Elem]] = {
@@ -265,7 +427,28 @@ ALPHABET: Dict[str, Type[Elem]] = {
 }
 
 
-def make_drawing(dwg: str) -> vp.LineCollection:
+# Intermediate representation of a drawing: one record per element
+RING_SPEC_DTYPE = np.dtype(
+    [
+        ("elem_type", "U1"),
+        ("radius", float),
+        ("dr", float),
+        ("start", float),
+        ("stop", float),
+        ("unit_length", float),
+    ]
+)
+
+
+def compile_drawing(dwg: str, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Parse a drawing into an array of RING_SPEC_DTYPE records
+
+    The random ring orientations are drawn at this stage (from rng, or from NumPy's global
+    generator if None), so that the result fully determines the rendered drawing. Being a
+    plain structured array, it can be cached or serialized (e.g. with np.save).
+    """
+    uniform = np.random.uniform if rng is None else rng.uniform
+
     lines = dwg.splitlines()
     if lines[0] == "":
         del lines[0]
@@ -276,9 +459,9 @@ def make_drawing(dwg: str) -> vp.LineCollection:
     base_margin = 0.2
     base_unit_length = 0.3
 
-    lc = vp.LineCollection()
+    records = []
     radius = base_radius
-    for i, ring in enumerate(lines):
+    for ring in lines:
 
         def count_modifier(s, plus, minus):
             cnt = s.count(plus) - s.count(minus)
@@ -289,9 +472,9 @@ def make_drawing(dwg: str) -> vp.LineCollection:
         ring, r_modifier = count_modifier(ring, "^", "v")
         ring, unit_length_modifier = count_modifier(ring, "+", "-")
 
-        dr = base_dr * (1.2 ** dr_modifier)
-        r = radius * (1.05 ** r_modifier)
-        unit_length = base_unit_length * 0.7 ** unit_length_modifier
+        dr = base_dr * (1.2**dr_modifier)
+        r = radius * (1.05**r_modifier)
+        unit_length = base_unit_length * 0.7**unit_length_modifier
 
         radius += dr + base_margin
 
@@ -301,39 +484,63 @@ def make_drawing(dwg: str) -> vp.LineCollection:
         elif len(ring) == 1:
             arc_bounds = np.array([0, 360])
         else:
-            arc_bounds = np.linspace(0, 360, len(ring) + 1) + np.random.uniform(0, 360)
+            arc_bounds = np.linspace(0, 360, len(ring) + 1) + uniform(0, 360)
 
+        # one element per streak of valid letters
         pos = 0
-        while pos < len(ring):
-            # fast track to first valid letter
-            while pos < len(ring) and ring[pos] not in ALPHABET:
-                pos += 1
-            if pos == len(ring):
-                break
-
-            # find end of streak
-            end_pos = pos
-            while end_pos < len(ring) and ring[end_pos] == ring[pos]:
-                end_pos += 1
-
-            elem_class = ALPHABET[ring[pos]]
-            # noinspection PyArgumentList
-            elem = elem_class(
-                center_x=0,
-                center_y=0,
-                radius=r,
-                dr=dr,
-                start_angle=arc_bounds[pos],
-                stop_angle=arc_bounds[end_pos],
-                unit_length=unit_length,
-            )
-            lc.extend(elem.render())
-
+        for letter, streak in itertools.groupby(ring):
+            end_pos = pos + len(list(streak))
+            if letter in ALPHABET:
+                records.append(
+                    (letter, r, dr, arc_bounds[pos], arc_bounds[end_pos], unit_length)
+                )
             pos = end_pos
 
+    return np.array(records, dtype=RING_SPEC_DTYPE)
+
+
+def render_spec(spec: np.ndarray, tolerance: float = 0.005) -> vp.LineCollection:
+    """Render compiled drawing, with one batched call per element type
+
+    Arcs are sampled with a max chord error of tolerance.
+    """
+    rendered: List[vp.LineCollection] = [vp.LineCollection()] * len(spec)
+    for letter in np.unique(spec["elem_type"]):
+        (indices,) = np.nonzero(spec["elem_type"] == letter)
+        elem_class = ALPHABET[letter]
+        elems = [elem_class.from_record(record, tolerance) for record in spec[indices]]
+        for index, lc in zip(indices, elem_class.render_batch(elems)):
+            rendered[index] = lc
+
+    lc = vp.LineCollection()
+    for elem_lc in rendered:
+        lc.extend(elem_lc)
     return lc
 
 
+def make_drawing(
+    dwg: str, tolerance: float = 0.005, rng: Optional[np.random.Generator] = None
+) -> vp.LineCollection:
+    return render_spec(compile_drawing(dwg, rng), tolerance)
+
+
+def cell_seed(seed: int, i: int, j: int) -> int:
+    """Derive the seed of the grid cell (i, j) from the sketch seed"""
+    return int(np.random.SeedSequence((seed, i, j)).generate_state(1)[0])
+
+
+def render_cell(
+    prob: Dict[str, float], letter_count: int, tolerance: float, seed: int
+) -> vp.LineCollection:
+    """Generate and render a random drawing, reproducibly from seed
+
+    Local generators are used, so that the global random state is left untouched.
+    """
+    rng = random.Random(seed)
+    drawing = "".join(rng.choices(list(prob.keys()), list(prob.values()), k=letter_count))
+    return make_drawing(drawing, tolerance, np.random.default_rng(seed))
+
+
 class CircularPatternSketch(vsketch.SketchClass):
 
     # matrix
@@ -347,6 +554,13 @@ class CircularPatternSketch(vsketch.SketchClass):
     letter_count = vsketch.Param(100)
     scale_factor = vsketch.Param(1.0, step=0.1)
 
+    # max deviation of the sampled arcs, in output mm
+    tolerance = vsketch.Param(0.05, 0.001, decimals=3, step=0.01)
+
+    # render the cells with per-cell seeds, in a pool of processes (0 for all cores)
+    parallel = vsketch.Param(False)
+    processes = vsketch.Param(0, 0)
+
     # modifiers
     prob_plus = vsketch.Param(0.1, 0, 1, decimals=2, step=0.05)
     prob_minus = vsketch.Param(0.1, 0, 1, decimals=2, step=0.05)
@@ -399,20 +613,36 @@ class CircularPatternSketch(vsketch.SketchClass):
             "L": self.prob_multiline,
         }
 
-        for j in range(self.ny):
-            for i in range(self.nx):
-
+        # drawings are in scaled cm
+        tolerance = self.tolerance / 10.0 / self.scale_factor
+
+        cells = [(i, j) for j in range(self.ny) for i in range(self.nx)]
+        if self.parallel:
+            # results only depend on the sketch seed, whatever the number of processes
+            seeds = [cell_seed(vsk.random_seed, i, j) for i, j in cells]
+            letter_count = self.letter_count
+            if self.processes == 1 or len(cells) == 1:
+                drawings = [render_cell(prob, letter_count, tolerance, seed) for seed in seeds]
+            else:
+                with multiprocess.Pool(self.processes or None) as pool:
+                    drawings = pool.map(
+                        lambda seed: render_cell(prob, letter_count, tolerance, seed), seeds
+                    )
+        else:
+            drawings = []
+            for _ in cells:
                 # noinspection SpellCheckingInspection
                 drawing = "".join(
                     random.choices(list(prob.keys()), list(prob.values()), k=self.letter_count)
                 )
-
-                lc = make_drawing(drawing)
-                vsk.stroke((i + j * self.nx) % self.nlayer + 1)
-                with vsk.pushMatrix():
-                    vsk.translate(i * self.dx, j * self.dy)
-                    for line in lc:
-                        vsk.polygon(line)
+                drawings.append(make_drawing(drawing, tolerance))
+
+        for (i, j), lc in zip(cells, drawings):
+            vsk.stroke((i + j * self.nx) % self.nlayer + 1)
+            with vsk.pushMatrix():
+                vsk.translate(i * self.dx, j * self.dy)
+                for line in lc:
+                    vsk.polygon(line)
 
     def finalize(self, vsk: vsketch.Vsketch) -> None:
         vsk.vpype("linesort linesimplify")
@@ -0,0 +1,196 @@
+"""Font lookup index, mapping font family names to font files.
+
+The system font directories (and matplotlib's bundled fonts, if installed) are scanned once
+with FreeType and the result is cached as JSON. The index is rebuilt automatically when one of
+the scanned directories changes, or explicitly from the command line.
+
+Usage:
+
+    python font_index.py [FAMILY ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import importlib.util
+import json
+import os
+import sys
+import warnings
+from pathlib import Path
+
+import freetype
+
+FONT_INDEX_PATH = Path(__file__).parent / ".cache" / "font_index.json"
+FONT_INDEX_VERSION = 1
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc")
+
+# used, with a warning, when a family is not found (as matplotlib does)
+FALLBACK_FAMILY = "DejaVu Sans"
+
+# preferred style names when picking a family's regular face
+REGULAR_STYLES = ("regular", "roman", "book", "normal", "plain", "medium")
+
+
+def font_dirs() -> list[Path]:
+    """Font directories of the current platform, plus matplotlib's bundled fonts."""
+    home = Path.home()
+    if sys.platform == "darwin":
+        dirs = [
+            Path("/System/Library/Fonts"),
+            Path("/Library/Fonts"),
+            home / "Library" / "Fonts",
+        ]
+    elif sys.platform == "win32":
+        dirs = [Path(os.environ.get("WINDIR", "C:\\Windows")) / "Fonts"]
+        if "LOCALAPPDATA" in os.environ:
+            dirs.append(Path(os.environ["LOCALAPPDATA"]) / "Microsoft" / "Windows" / "Fonts")
+    else:
+        data_home = Path(os.environ.get("XDG_DATA_HOME", home / ".local" / "share"))
+        dirs = [
+            Path("/usr/share/fonts"),
+            Path("/usr/local/share/fonts"),
+            home / ".fonts",
+            data_home / "fonts",
+        ]
+
+    # locate matplotlib's fonts without importing it
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is not None and spec.submodule_search_locations:
+        for location in spec.submodule_search_locations:
+            dirs.append(Path(location) / "mpl-data" / "fonts" / "ttf")
+
+    return [d for d in dirs if d.is_dir()]
+
+
+def _walk(dirs: list[Path]) -> tuple[dict[str, int], list[str]]:
+    """Return the modification time of every (sub)directory and the font files they
+    contain."""
+    mtimes = {}
+    files = []
+    for font_dir in dirs:
+        for root, _, names in os.walk(font_dir):
+            mtimes[root] = os.stat(root).st_mtime_ns
+            files.extend(
+                os.path.join(root, name)
+                for name in sorted(names)
+                if name.lower().endswith(FONT_EXTENSIONS)
+            )
+    return mtimes, files
+
+
+def _faces(path: str) -> list[dict]:
+    try:
+        face = freetype.Face(path)
+        faces = [face] + [freetype.Face(path, index=i) for i in range(1, face.num_faces)]
+    except freetype.FT_Exception:
+        return []
+
+    return [
+        {
+            "family": face.family_name.decode(errors="replace"),
+            "style": (face.style_name or b"").decode(errors="replace"),
+            "path": path,
+            "index": index,
+            "italic": bool(face.style_flags & freetype.FT_STYLE_FLAG_ITALIC),
+            "bold": bool(face.style_flags & freetype.FT_STYLE_FLAG_BOLD),
+        }
+        for index, face in enumerate(faces)
+        if face.family_name
+    ]
+
+
+def build_index(dirs: list[Path] | None = None) -> dict:
+    """Scan the font directories and save the index."""
+    mtimes, files = _walk(font_dirs() if dirs is None else dirs)
+
+    families: dict[str, list[dict]] = {}
+    for path in files:
+        for face in _faces(path):
+            families.setdefault(face["family"].casefold(), []).append(face)
+
+    index = {"version": FONT_INDEX_VERSION, "dirs": mtimes, "families": families}
+
+    # write to a temporary file first, as several `vsk save` processes may race here
+    FONT_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = FONT_INDEX_PATH.with_name(f"{FONT_INDEX_PATH.stem}_{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(index))
+    os.replace(tmp_path, FONT_INDEX_PATH)
+
+    return index
+
+
+def _is_stale(index: dict) -> bool:
+    if index.get("version") != FONT_INDEX_VERSION:
+        return True
+    try:
+        return any(os.stat(d).st_mtime_ns != mtime for d, mtime in index["dirs"].items())
+    except OSError:
+        return True
+
+
+@functools.lru_cache(maxsize=None)
+def load_index() -> dict:
+    """Load the cached index, (re)building it if missing or out of date."""
+    try:
+        index = json.loads(FONT_INDEX_PATH.read_text())
+    except (OSError, ValueError):
+        return build_index()
+    return build_index() if _is_stale(index) else index
+
+
+def family_faces(family: str) -> list[dict]:
+    """Return the indexed faces of a family, regular faces first."""
+    faces = load_index()["families"].get(family.casefold(), [])
+    return sorted(
+        faces,
+        key=lambda face: (
+            face["italic"],
+            face["bold"],
+            face["style"].casefold() not in REGULAR_STYLES,
+            face["path"],
+            face["index"],
+        ),
+    )
+
+
+def find_font(family: str) -> str:
+    """Return the path of the file containing a family's regular face.
+
+    Font file paths are returned as is. Unknown families fall back to ``FALLBACK_FAMILY``
+    with a warning.
+    """
+    if os.path.isfile(family):
+        return family
+
+    faces = family_faces(family)
+    if not faces:
+        fallback_faces = family_faces(FALLBACK_FAMILY)
+        if not fallback_faces:
+            raise ValueError(
+                f"font family '{family}' not found, nor the fallback '{FALLBACK_FAMILY}'"
+            )
+        warnings.warn(f"font family '{family}' not found, falling back to {FALLBACK_FAMILY}")
+        faces = fallback_faces
+
+    return faces[0]["path"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the font index.")
+    parser.add_argument("families", nargs="*", help="families to look up after rebuilding")
+    args = parser.parse_args()
+
+    built = build_index()
+    face_count = sum(len(faces) for faces in built["families"].values())
+    print(
+        f"Indexed {face_count} faces in {len(built['families'])} families "
+        f"from {len(built['dirs'])} directories to {FONT_INDEX_PATH}"
+    )
+
+    for family_name in args.families:
+        print()
+        print(f"{family_name}:")
+        for f in family_faces(family_name):
+            print(f"    {f['style']:24s} {f['path']} (face {f['index']})")
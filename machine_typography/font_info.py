@@ -5,8 +5,8 @@ Usage:
     python font_info.py FONTNAME
 """
 
+from font_index import find_font
 from freetype import *
-from matplotlib import font_manager
 
 if __name__ == "__main__":
     import sys
@@ -20,7 +20,7 @@ if __name__ == "__main__":
     else:
         index = 0
 
-    font_file = font_manager.findfont(sys.argv[1])
+    font_file = find_font(sys.argv[1])
     print(f"Reading {font_file}")
     face = Face(font_file, index=index)
 
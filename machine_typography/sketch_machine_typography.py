@@ -1,71 +1,332 @@
-import io
+import functools
+import hashlib
 import itertools
 import math
 import os
 import string
 import sys
 from pathlib import Path
+from typing import Dict, List, Union
 
 import freetype
-import vpype as vp
+import numpy as np
+import shapely
 import vsketch
-from matplotlib import font_manager
 from shapely.affinity import scale, translate
-from shapely.geometry import JOIN_STYLE, MultiLineString, MultiPoint, Point, Polygon, box
+from shapely.geometry import (
+    JOIN_STYLE,
+    GeometryCollection,
+    MultiLineString,
+    MultiPolygon,
+    Point,
+    Polygon,
+    box,
+)
 from shapely.ops import unary_union
 
 sys.path.append(str(Path(__file__).parent))
 
+from font_index import find_font
+
+# glyphs are loaded at 128pt, i.e. with 8192 font units per em
+GLYPH_CHAR_SIZE = 128 * 64
+
+# max distance between curves and their flattened polylines, in font units
+FLATNESS = 0.5
+
+# glyph polygons are cached in memory and as WKB files
+GLYPH_CACHE_DIR = Path(__file__).parent / ".cache" / "glyphs"
+GLYPH_CACHE_SIZE = 256
+GLYPH_CACHE_VERSION = 2
+
+
+def flatten_bezier(points: np.ndarray) -> np.ndarray:
+    """Flatten a quadratic or cubic Bézier curve given by its complex control points,
+    returning all points but the first one.
+
+    The number of segments is the smallest for which the distance to the curve is bounded by
+    FLATNESS, i.e. n ≥ sqrt(d (d - 1) max|P[i] - 2 P[i+1] + P[i+2]| / (8 FLATNESS)).
+    """
+    degree = len(points) - 1
+    second_diff = np.abs(points[:-2] - 2 * points[1:-1] + points[2:]).max()
+    n = max(1, math.ceil(math.sqrt(degree * (degree - 1) * second_diff / (8 * FLATNESS))))
+    t = np.linspace(0, 1, n + 1)[1:, np.newaxis]
+    basis = np.hstack(
+        [math.comb(degree, k) * (1 - t) ** (degree - k) * t**k for k in range(degree + 1)]
+    )
+    return basis @ points
+
 
 def move_to(a, ctx):
-    ctx.append("M {},{}".format(a.x, a.y))
+    ctx.append([np.array([complex(a.x, a.y)])])
 
 
 def line_to(a, ctx):
-    ctx.append("L {},{}".format(a.x, a.y))
+    ctx[-1].append(np.array([complex(a.x, a.y)]))
 
 
 def conic_to(a, b, ctx):
-    ctx.append("Q {},{} {},{}".format(a.x, a.y, b.x, b.y))
+    ctx[-1].append(
+        flatten_bezier(np.array([ctx[-1][-1][-1], complex(a.x, a.y), complex(b.x, b.y)]))
+    )
 
 
 def cubic_to(a, b, c, ctx):
-    ctx.append("C {},{} {},{} {},{}".format(a.x, a.y, b.x, b.y, c.x, c.y))
+    ctx[-1].append(
+        flatten_bezier(
+            np.array(
+                [ctx[-1][-1][-1], complex(a.x, a.y), complex(b.x, b.y), complex(c.x, c.y)]
+            )
+        )
+    )
 
 
-def load_glyph(font_name: str, glyph: str, index: int = 0) -> Polygon:
-    face = freetype.Face(font_manager.findfont(font_name), index=index)
-    face.set_char_size(128 * 64)
+def _xor_polygon(coords: List[np.ndarray]) -> Union[Polygon, MultiPolygon]:
+    """Build the even-odd fill of arbitrary rings, one symmetric difference at a time."""
+    poly = Polygon()
+    for c in coords:
+        poly = poly.symmetric_difference(shapely.make_valid(Polygon(c)))
+    return poly
+
+
+def even_odd_polygon(rings: List[np.ndarray]) -> Union[Polygon, MultiPolygon]:
+    """Build the even-odd fill of rings (complex arrays).
+
+    Rings contained by an even number of other rings are shells, the others are holes of
+    their innermost container. This assumes that rings don't cross, which some fonts' glyphs
+    (e.g. Zapfino's) don't abide by: these are handled by the slower _xor_polygon().
+    """
+    coords = [np.column_stack([ring.real, ring.imag]) for ring in rings if len(ring) >= 3]
+    polys = shapely.polygons([shapely.linearrings(c) for c in coords])
+
+    # contains[i, j]: ring j is inside ring i (rings don't cross, so one vertex suffices)
+    first = np.array([c[0] for c in coords])
+    contains = shapely.contains_xy(polys[:, np.newaxis], first[:, 0], first[:, 1])
+    np.fill_diagonal(contains, False)
+    depth = contains.sum(axis=0)
+
+    holes: Dict[int, List[np.ndarray]] = {i: [] for i in np.flatnonzero(depth % 2 == 0)}
+    for j in np.flatnonzero(depth % 2 == 1):
+        (containers,) = np.nonzero(contains[:, j])
+        parent = containers[np.argmax(depth[containers])]
+        holes[parent].append(coords[j])
+
+    shells = [Polygon(coords[i], holes[i]) for i in holes]
+    poly = shells[0] if len(shells) == 1 else MultiPolygon(shells)
+    return poly if poly.is_valid else _xor_polygon(coords)
+
+
+def _flatten_glyph(
+    font_path: str, glyph: str, index: int, char_size: int
+) -> Union[Polygon, MultiPolygon]:
+    face = freetype.Face(font_path, index=index)
+    face.set_char_size(char_size)
     face.load_char(glyph, freetype.FT_LOAD_DEFAULT | freetype.FT_LOAD_NO_BITMAP)
     ctx = []
     face.glyph.outline.decompose(
         ctx, move_to=move_to, line_to=line_to, conic_to=conic_to, cubic_to=cubic_to
     )
-    bbox = face.glyph.outline.get_bbox()
-    width = bbox.xMax - bbox.xMin
-    height = bbox.yMax - bbox.yMin
-    svg = f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">
-  <g transform="translate(0, {bbox.yMax - bbox.yMin}) scale(1, -1) translate({-bbox.xMin}, {-bbox.yMin})" transform-origin="0 0">
-    <path
-      style="fill:none;stroke:#000000;stroke-width:2;stroke-linecap:butt;stroke-linejoin:miter;stroke-miterlimit:4;stroke-opacity:1;stroke-dasharray:none;stroke-dashoffset:0"
-      d="{' '.join(ctx)}"
-    />
-    <!-- rect x="{bbox.xMin}" y="{bbox.yMin}" width="{width}" height="{height}" /-->
-  </g>
-</svg>
-"""
-
-    svg_io = io.StringIO(svg)
-    lc, w, h = vp.read_svg(svg_io, 1)
-
-    mls = lc.as_mls()
-    poly = Polygon(mls.geoms[0])
-    for geom in mls.geoms[1:]:
-        poly = poly.symmetric_difference(Polygon(geom))
+
+    # flip to the page's downward y axis
+    return even_odd_polygon([np.concatenate(contour).conj() for contour in ctx])
+
+
+def _glyph_cache_path(font_path: str, glyph: str, index: int, char_size: int) -> Path:
+    """Cache file name, keyed on the font file's path and modification time, the glyph
+    parameters and the cache format version."""
+    key = (
+        os.path.abspath(font_path),
+        os.stat(font_path).st_mtime_ns,
+        index,
+        glyph,
+        char_size,
+        FLATNESS,
+        GLYPH_CACHE_VERSION,
+    )
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+    return GLYPH_CACHE_DIR / f"glyph_{digest}.wkb"
+
+
+@functools.lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def load_glyph(
+    font_name: str, glyph: str, index: int = 0, char_size: int = GLYPH_CHAR_SIZE
+) -> Union[Polygon, MultiPolygon]:
+    """Load a glyph's outline as a polygon, using the in-memory then on-disk caches when
+    available."""
+    font_path = find_font(font_name)
+    path = _glyph_cache_path(font_path, glyph, index, char_size)
+    try:
+        return shapely.from_wkb(path.read_bytes())
+    except (OSError, shapely.errors.GEOSException):
+        pass
+
+    poly = _flatten_glyph(font_path, glyph, index, char_size)
+
+    # write to a temporary file first, as several `vsk save` processes may race here
+    GLYPH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}_{os.getpid()}.tmp")
+    tmp_path.write_bytes(shapely.to_wkb(poly))
+    os.replace(tmp_path, path)
+
     return poly
 
 
+def hex_lattice(width: float, height: float, margin: float, pitch: float) -> np.ndarray:
+    """Centers of a hexagonal lattice filling the page, row by row, with odd rows shifted by
+    half a pitch and one point shorter."""
+    v_pitch = pitch * math.tan(math.pi / 3) / 2
+    h_count = int((width - 2 * margin) // pitch)
+    v_count = int((height - 2 * margin) // v_pitch)
+    h_offset = (width - h_count * pitch) / 2
+    v_offset = (height - v_count * v_pitch) / 2
+
+    j, i = np.mgrid[: v_count + 1, : h_count + 1]
+    odd_line = j % 2 == 1
+    mask = ~odd_line | (i < h_count)
+    x = h_offset + i * pitch + np.where(odd_line, pitch / 2, 0)
+    y = v_offset + j * v_pitch
+    return np.stack([x[mask], y[mask]], axis=-1)
+
+
+def stamp_circles(centers: np.ndarray, radius: float) -> MultiPolygon:
+    """Circles of the same radius, stamped from a single template ring."""
+    ring = np.array(Point(0, 0).buffer(radius).exterior.coords)
+    return shapely.multipolygons(shapely.polygons(ring + centers[:, np.newaxis, :]))
+
+
+def polygon_edges(poly: Union[Polygon, MultiPolygon]) -> np.ndarray:
+    """Edges of all of a polygon's rings, as an (N, 4) array of x0, y0, x1, y1."""
+    rings = shapely.get_rings(shapely.get_parts(poly))
+    coords, index = shapely.get_coordinates(rings, return_index=True)
+    same_ring = index[:-1] == index[1:]
+    return np.hstack([coords[:-1][same_ring], coords[1:][same_ring]])
+
+
+class GlyphClip:
+    """Clip regions shared by the fill patterns: outside the glyph's outer buffer, or inside
+    its inner buffer.
+
+    Both regions are prepared once per draw. Parts of a pattern lying entirely on one side
+    of a region are kept or dropped with batched predicates, and the generic overlay only
+    runs on the parts crossing its boundary. Horizontal lines are clipped with a scanline
+    against the region's edges instead.
+    """
+
+    def __init__(
+        self, outer: Union[Polygon, MultiPolygon], inner: Union[Polygon, MultiPolygon]
+    ):
+        self.outer = outer
+        self.inner = inner
+        shapely.prepare(self.outer)
+        shapely.prepare(self.inner)
+
+    @functools.cached_property
+    def _outer_edges(self) -> np.ndarray:
+        return polygon_edges(self.outer)
+
+    @functools.cached_property
+    def _inner_edges(self) -> np.ndarray:
+        return polygon_edges(self.inner)
+
+    @staticmethod
+    def _clip(geom, region, inside: bool) -> GeometryCollection:
+        parts = shapely.get_parts(geom)
+        crossing = shapely.intersects(region, parts)
+        covered = crossing & shapely.covers(region, parts)
+        if inside:
+            kept = parts[covered]
+            clipped = shapely.intersection(parts[crossing & ~covered], region)
+        else:
+            kept = parts[~crossing]
+            clipped = shapely.difference(parts[crossing & ~covered], region)
+        return shapely.geometrycollections(np.concatenate([kept, shapely.get_parts(clipped)]))
+
+    def outside(self, geom) -> GeometryCollection:
+        """Equivalent to ``geom.difference(outer)``."""
+        return self._clip(geom, self.outer, inside=False)
+
+    def inside(self, geom) -> GeometryCollection:
+        """Equivalent to ``geom.intersection(inner)``."""
+        return self._clip(geom, self.inner, inside=True)
+
+    def outside_points(self, xy: np.ndarray) -> np.ndarray:
+        """Points of an (N, 2) array lying outside the outer region."""
+        return xy[~shapely.intersects_xy(self.outer, xy)]
+
+    def inside_points(self, xy: np.ndarray) -> np.ndarray:
+        """Points of an (N, 2) array lying in the inner region."""
+        return xy[shapely.intersects_xy(self.inner, xy)]
+
+    @staticmethod
+    def _crossings(edges: np.ndarray, ys: np.ndarray, side: str) -> np.ndarray:
+        """Intervals covered by a region along increasing scanlines, as rows of (scanline
+        index, x start, x end).
+
+        Each edge only visits the scanlines within its y span, found by bisection. The
+        half-open crossing rule counts edges' low ends with ``side="left"`` and their high
+        ends with ``side="right"``, i.e. as if scanlines were nudged slightly up or down.
+        """
+        ex0, ey0, ex1, ey1 = edges.T
+        start = np.searchsorted(ys, np.minimum(ey0, ey1), side=side)
+        count = np.searchsorted(ys, np.maximum(ey0, ey1), side=side) - start
+        edge = np.repeat(np.arange(len(edges)), count)
+        row = np.arange(count.sum()) + np.repeat(start - np.cumsum(count) + count, count)
+
+        x = ex0[edge] + (ys[row] - ey0[edge]) * (ex1[edge] - ex0[edge]) / (
+            ey1[edge] - ey0[edge]
+        )
+        order = np.lexsort((x, row))
+        row, x = row[order], x[order]
+
+        # each closed ring crosses a scanline an even number of times
+        return np.column_stack([row[::2], x[::2], x[1::2]])
+
+    @classmethod
+    def _scanline(
+        cls, edges: np.ndarray, ys: np.ndarray, x0: float, x1: float, inside: bool
+    ) -> MultiLineString:
+        ys = np.sort(ys)
+
+        # Regions are closed, so edges lying on a scanline belong to them. Each side of the
+        # half-open rule only catches one side of such edges, so their intervals are merged.
+        intervals = np.concatenate(
+            [cls._crossings(edges, ys, "left"), cls._crossings(edges, ys, "right")]
+        )
+        intervals = intervals[np.lexsort((intervals[:, 1], intervals[:, 0]))]
+        splits = np.searchsorted(intervals[:, 0], np.arange(1, len(ys)))
+
+        segments = []
+        for line_y, row_intervals in zip(ys, np.split(intervals[:, 1:], splits)):
+            merged: List[List[float]] = []
+            for a, b in row_intervals:
+                if merged and a <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], b)
+                else:
+                    merged.append([a, b])
+
+            cursor = x0
+            for a, b in merged:
+                a, b = max(a, x0), min(b, x1)
+                if inside and a < b:
+                    segments.append((a, line_y, b, line_y))
+                elif not inside and cursor < a:
+                    segments.append((cursor, line_y, min(a, x1), line_y))
+                cursor = max(cursor, b)
+            if not inside and cursor < x1:
+                segments.append((cursor, line_y, x1, line_y))
+
+        coords = np.array(segments, dtype=float).reshape(-1, 2, 2)
+        return shapely.multilinestrings(shapely.linestrings(coords))
+
+    def outside_hlines(self, ys: np.ndarray, x0: float, x1: float) -> MultiLineString:
+        """Horizontal lines from x0 to x1 at ys, minus the outer region."""
+        return self._scanline(self._outer_edges, ys, x0, x1, inside=False)
+
+    def inside_hlines(self, ys: np.ndarray, x0: float, x1: float) -> MultiLineString:
+        """Horizontal lines from x0 to x1 at ys, intersected with the inner region."""
+        return self._scanline(self._inner_edges, ys, x0, x1, inside=True)
+
+
 class MachineTypographySketch(vsketch.SketchClass):
     # Sketch parameters:
     font = vsketch.Param(
@@ -219,25 +480,19 @@ class MachineTypographySketch(vsketch.SketchClass):
         if glyph_shadow is not None:
             glyph_poly_int = glyph_poly_int.difference(glyph_shadow)
 
+        clip = GlyphClip(glyph_poly_ext, glyph_poly_int)
+
         # horizontal stripes
         if self.draw_h_stripes:
             count = round((vsk.height - 2 * self.margin) / self.h_stripes_pitch)
             corrected_pitch = (vsk.height - 2 * self.margin) / count
-            hstripes = MultiLineString(
-                [
-                    [
-                        (self.margin, self.margin + i * corrected_pitch),
-                        (vsk.width - self.margin, self.margin + i * corrected_pitch),
-                    ]
-                    for i in range(count + 1)
-                ]
-            )
+            stripes_y = self.margin + np.arange(count + 1) * corrected_pitch
 
-            vsk.geometry(hstripes.difference(glyph_poly_ext))
+            vsk.geometry(clip.outside_hlines(stripes_y, self.margin, vsk.width - self.margin))
 
             if self.h_stripes_inside:
-                inside_stripes = translate(hstripes, 0, corrected_pitch / 2).intersection(
-                    glyph_poly_int
+                inside_stripes = clip.inside_hlines(
+                    stripes_y + corrected_pitch / 2, self.margin, vsk.width - self.margin
                 )
                 vsk.geometry(inside_stripes)
 
@@ -254,62 +509,57 @@ class MachineTypographySketch(vsketch.SketchClass):
             circle_count = int(
                 math.ceil(math.hypot(vsk.width, vsk.height) / 2 / self.concentric_pitch)
             )
-            circles = unary_union(
-                [
-                    Point(vsk.width / 2, vsk.height / 2)
-                    .buffer(
-                        (i + 1) * self.concentric_pitch,
-                        resolution=int(1 * (i + 1) * self.concentric_pitch),
-                    )
-                    .exterior
-                    for i in range(circle_count)
-                ]
-            )
-            vsk.geometry(
-                circles.difference(glyph_poly_ext).intersection(
-                    box(
-                        self.margin,
-                        self.margin,
-                        vsk.width - self.margin,
-                        vsk.height - self.margin,
-                    )
+            # circles are concentric, hence never cross and don't need to be merged
+            circles = [
+                Point(vsk.width / 2, vsk.height / 2)
+                .buffer(
+                    (i + 1) * self.concentric_pitch,
+                    resolution=int(1 * (i + 1) * self.concentric_pitch),
                 )
+                .exterior
+                for i in range(circle_count)
+            ]
+            page = box(
+                self.margin,
+                self.margin,
+                vsk.width - self.margin,
+                vsk.height - self.margin,
             )
+            vsk.geometry(clip.outside(shapely.intersection(circles, page)))
 
         # dots
         vsk.fill(1)
         if self.draw_dots or self.draw_cut_circles:
-            v_pitch = self.pitch * math.tan(math.pi / 3) / 2
-            h_count = int((vsk.width - 2 * self.margin) // self.pitch)
-            v_count = int((vsk.height - 2 * self.margin) // v_pitch)
-            h_offset = (vsk.width - h_count * self.pitch) / 2
-            v_offset = (vsk.height - v_count * v_pitch) / 2
-
-            dot_array = []
-            for j in range(v_count + 1):
-                odd_line = j % 2 == 1
-                for i in range(h_count + (0 if odd_line else 1)):
-                    dot = Point(
-                        h_offset + i * self.pitch + (self.pitch / 2 if odd_line else 0),
-                        v_offset + j * v_pitch,
-                    ).buffer(self.thickness / 2)
-
-                    if self.draw_dots:
-                        if not dot.buffer(self.thickness / 2).intersects(glyph_poly_ext):
-                            dot_array.append(dot)
-                    else:
-                        dot_array.append(dot)
-
-            dots = unary_union(dot_array)
+            centers = hex_lattice(vsk.width, vsk.height, self.margin, self.pitch)
+
+            if self.draw_dots:
+                # keep a clearance of one dot radius around the glyph
+                centers = centers[
+                    ~shapely.dwithin(clip.outer, shapely.points(centers), self.thickness)
+                ]
+
+            dots = stamp_circles(centers, self.thickness / 2)
+            overlapping = self.thickness >= self.pitch
+            if overlapping:
+                dots = unary_union(dots)
 
             if self.draw_dots:
-                vsk.geometry(dots)
+                if overlapping:
+                    vsk.geometry(dots)
+                else:
+                    # all dots are identical, so fill a single one and stamp it
+                    dot = vsketch.Vsketch()
+                    dot.penWidth(self.pen_width)
+                    dot.fill(1)
+                    dot.geometry(Point(0, 0).buffer(self.thickness / 2))
+                    for x, y in centers:
+                        vsk.pushMatrix()
+                        vsk.translate(x, y)
+                        vsk.sketch(dot)
+                        vsk.popMatrix()
 
             if self.draw_cut_circles:
-                if self.cut_circles_inside:
-                    op_func = lambda geom: geom.intersection(glyph_poly_int)
-                else:
-                    op_func = lambda geom: geom.difference(glyph_poly_ext)
+                op_func = clip.inside if self.cut_circles_inside else clip.outside
 
                 vsk.geometry(op_func(dots))
 
@@ -344,20 +594,21 @@ class MachineTypographySketch(vsketch.SketchClass):
             h_pitch = (vsk.width - 2 * self.margin) / (h_count - 1)
             v_pitch = (vsk.height - 2 * self.margin) / (v_count - 1)
 
-            mp = MultiPoint(
+            xy = np.array(
                 [
                     (self.margin + i * h_pitch, self.margin + j * v_pitch)
                     for i, j in itertools.product(range(h_count), range(v_count))
                     if vsk.random(1) < self.dot_matrix_density
                 ]
-            )
+            ).reshape(-1, 2)
 
             if self.draw_dot_matrix_inside:
-                mp = mp.intersection(glyph_poly_int)
+                xy = clip.inside_points(xy)
             else:
-                mp = mp.difference(glyph_poly_ext)
+                xy = clip.outside_points(xy)
 
-            vsk.geometry(mp)
+            for x, y in xy:
+                vsk.point(x, y)
             vsk.vpype("color -l4 black")
 
         vsk.vpype("color -l1 black color -l2 cyan color -l3 magenta")
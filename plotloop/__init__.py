@@ -0,0 +1,15 @@
+"""Shared tooling for the Automatic #plotloop Machine projects (``world`` and ``warp``).
+
+Details: https://bylr.info/articles/2022/12/22/automatic-plotloop-machine/
+"""
+
+from .gif import GifWriter
+from .pipeline import (
+    FileSpec,
+    HashCache,
+    assemble_gif,
+    make_file_specs,
+    run_once,
+    simulate_sketch,
+)
+from .raster import rasterize_documents
@@ -0,0 +1,138 @@
+"""Incremental GIF encoder.
+
+Contrary to ``Image.save(..., save_all=True)`` (or ImageMagick's ``convert``), which hold every
+frame in memory until the animation is written, frames are encoded and written to disk as they
+are appended, so that memory use doesn't depend on the number of frames.
+
+Each frame is encoded by Pillow as a standalone, single-image GIF, whose blocks are then
+spliced into the animation following the GIF89a specification: its global color table becomes
+the frame's local color table.
+"""
+
+from __future__ import annotations
+
+import io
+import pathlib
+import struct
+
+from PIL import Image
+
+_TRAILER = 0x3B
+_EXTENSION = 0x21
+_IMAGE_DESCRIPTOR = 0x2C
+_COLOR_TABLE_FLAG = 0x80
+_COLOR_TABLE_SIZE = 0x07
+
+
+def _color_table_length(flags: int) -> int:
+    return 3 * 2 ** ((flags & _COLOR_TABLE_SIZE) + 1) if flags & _COLOR_TABLE_FLAG else 0
+
+
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+def _frame_blocks(data: bytes) -> bytes:
+    """Extract the extension and image blocks of a single-image GIF stream, moving its global
+    color table to the image's local color table."""
+
+    flags = data[10]
+    pos = 13 + _color_table_length(flags)
+    global_color_table = data[13:pos]
+
+    blocks = bytearray()
+    while data[pos] != _TRAILER:
+        if data[pos] == _EXTENSION:
+            end = _skip_sub_blocks(data, pos + 2)
+            blocks += data[pos:end]
+        elif data[pos] == _IMAGE_DESCRIPTOR:
+            descriptor = bytearray(data[pos : pos + 10])
+            local_color_table_end = pos + 10 + _color_table_length(descriptor[9])
+            if global_color_table and not descriptor[9] & _COLOR_TABLE_FLAG:
+                descriptor[9] |= _COLOR_TABLE_FLAG | (flags & _COLOR_TABLE_SIZE)
+                blocks += descriptor + global_color_table
+            else:
+                blocks += data[pos:local_color_table_end]
+
+            # LZW minimum code size, followed by the image data sub-blocks
+            end = _skip_sub_blocks(data, local_color_table_end + 1)
+            blocks += data[local_color_table_end:end]
+        else:
+            raise ValueError(f"unexpected GIF block 0x{data[pos]:02x}")
+        pos = end
+
+    return bytes(blocks)
+
+
+class GifWriter:
+    """Write a looping GIF animation one frame at a time.
+
+    Grayscale frames use an exact 256-level gray palette, and color frames an adaptive
+    palette of their own. With ``shared_palette``, color frames are instead all mapped to the
+    palette of the first frame, which avoids color flicker but is only suitable when all
+    frames have similar colors.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        delay: int = 50,
+        loop: int = 0,
+        shared_palette: bool = False,
+    ):
+        self.path = path
+        self.delay = delay
+        self.loop = loop
+        self.shared_palette = shared_palette
+        self.frame_count = 0
+        self._palette: Image.Image | None = None
+        self._size: tuple[int, int] | None = None
+        self._fp = open(path, "wb")
+
+    def __enter__(self) -> GifWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _quantize(self, img: Image.Image) -> Image.Image:
+        if img.mode in ("1", "L"):
+            # exact mapping to a 256-level gray palette
+            return img.convert("L")
+
+        if not self.shared_palette:
+            return img.convert("RGB").quantize(256)
+
+        if self._palette is None:
+            self._palette = img.convert("RGB").quantize(256)
+        return img.convert("RGB").quantize(palette=self._palette, dither=Image.Dither.NONE)
+
+    def _write_header(self, size: tuple[int, int]) -> None:
+        # logical screen descriptor without global color table, and looping extension
+        self._fp.write(b"GIF89a" + struct.pack("<HHBBB", *size, 0x70, 0, 0))
+        self._fp.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self.loop) + b"\0")
+
+    def append(self, img: Image.Image) -> None:
+        """Encode a frame and write it to the file."""
+
+        frame = self._quantize(img)
+
+        if self._size is None:
+            self._size = frame.size
+            self._write_header(frame.size)
+        elif frame.size != self._size:
+            raise ValueError(
+                f"frame size {frame.size} doesn't match animation size {self._size}"
+            )
+
+        buffer = io.BytesIO()
+        frame.save(buffer, "GIF", duration=self.delay, optimize=False)
+        self._fp.write(_frame_blocks(buffer.getvalue()))
+        self.frame_count += 1
+
+    def close(self) -> None:
+        if not self._fp.closed:
+            self._fp.write(bytes([_TRAILER]))
+            self._fp.close()
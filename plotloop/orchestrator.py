@@ -0,0 +1,311 @@
+"""Asynchronous plot/capture/advance orchestration for the plotloop machine.
+
+The plotter is driven through a single, multiplexed SSH connection (OpenSSH's ControlMaster),
+and the campi server through a pooled HTTP client. While a frame is being plotted, the next
+frame's SVG is uploaded to the plotter and the previous frame's picture is processed. Each
+stage's timing is logged.
+
+Usage (against the local stand-ins of ``standin.py``):
+
+    python -m plotloop.orchestrator --standin SVG [SVG ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import dataclasses
+import pathlib
+import shlex
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Sequence
+
+import httpx
+
+from .pipeline import FileSpec, HashCache, file_hash
+
+AXICLI = "/home/pi/src/taxi/venv/bin/axicli -L 2 -d 37 -u 60 -N"
+SSH_OPTIONS = (
+    "-o",
+    "ControlMaster=auto",
+    "-o",
+    "ControlPath=~/.ssh/plotloop-%r@%h:%p",
+    "-o",
+    "ControlPersist=10m",
+)
+
+
+class CommandError(Exception):
+    pass
+
+
+async def _run(args: Sequence[str], stdin: bytes | None = None) -> bytes:
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, _ = await proc.communicate(stdin)
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise CommandError(f"command {shlex.join(args)} failed with code {proc.returncode}")
+    return stdout
+
+
+class Plotter:
+    """Remote AxiDraw, driven with ``axicli``.
+
+    Commands are run with ``shell + [command]``, which by default goes through a persistent,
+    multiplexed SSH connection to ``host``.
+    """
+
+    def __init__(
+        self,
+        host: str = "axidraw.local",
+        axicli: str = AXICLI,
+        shell: Sequence[str] | None = None,
+        remote_dir: str = "/tmp",
+    ):
+        self.axicli = axicli
+        self.shell = list(shell) if shell is not None else ["ssh", *SSH_OPTIONS, host]
+        self.remote_dir = remote_dir
+
+        # the plotter can only do one thing at a time, but uploads may run concurrently
+        self._lock = asyncio.Lock()
+
+    async def _axicli(self, args: str) -> None:
+        async with self._lock:
+            await _run([*self.shell, f"{self.axicli} {args}"])
+
+    async def upload(self, path: pathlib.Path) -> str:
+        remote_path = f"{self.remote_dir}/plotloop_{path.name}"
+        await _run([*self.shell, f"cat > {shlex.quote(remote_path)}"], path.read_bytes())
+        return remote_path
+
+    async def plot(self, remote_path: str) -> None:
+        await self._axicli(f"{shlex.quote(remote_path)} -m plot")
+
+    async def walk_y(self, distance: float) -> None:
+        await self._axicli(f"-m manual -M walk_y --walk_dist {distance}")
+
+
+class Campi:
+    """Client of the campi server (``world/campi/campi.py``), using a pooled connection."""
+
+    def __init__(
+        self,
+        server: str = "http://campi.local:8000",
+        timeout: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.client = httpx.AsyncClient(base_url=server, timeout=timeout, transport=transport)
+
+    async def __aenter__(self) -> Campi:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.client.aclose()
+
+    async def capture(
+        self, ev: int = 0, keep_raw: bool = False, **postprocess
+    ) -> tuple[bytes, int]:
+        """Capture a picture, optionally post-processed by the server (see
+        ``world/campi/postprocess.py`` for the parameters), and return it along with its
+        index in the server's frame buffer. With ``keep_raw``, the buffer holds the
+        unprocessed picture."""
+        params = {"ev": ev, "keep_raw": keep_raw, **postprocess}
+        response = await self.client.get("/img/", params=params)
+        response.raise_for_status()
+        return response.content, int(response.headers["X-Frame-Index"])
+
+    async def frame(self, index: int) -> bytes:
+        """Fetch an unprocessed capture from the server's frame buffer."""
+        response = await self.client.get(f"/frames/{index}")
+        response.raise_for_status()
+        return response.content
+
+    async def set_exposure(self, ev: int) -> None:
+        """Set the exposure value ahead of the next capture, to give the camera time to
+        settle."""
+        response = await self.client.get("/exposure/", params={"ev": ev})
+        response.raise_for_status()
+
+    async def advance(self, cm: int) -> None:
+        response = await self.client.get(f"/motor/{cm}")
+        response.raise_for_status()
+
+
+@dataclasses.dataclass
+class TimingLog:
+    """Record of each stage's duration, optionally appended to a CSV file."""
+
+    path: pathlib.Path | None = None
+    start: float = dataclasses.field(default_factory=time.perf_counter)
+    records: list[tuple[int, str, float, float]] = dataclasses.field(default_factory=list)
+
+    async def time(self, frame: int, stage: str, awaitable: Awaitable):
+        begin = time.perf_counter()
+        result = await awaitable
+        end = time.perf_counter()
+
+        record = (frame, stage, begin - self.start, end - begin)
+        self.records.append(record)
+        print(f"frame {frame:4d} {stage:12s} {end - begin:7.2f}s")
+        if self.path is not None:
+            with open(self.path, "a", newline="") as fp:
+                csv.writer(fp).writerow(
+                    [f"{v:.3f}" if isinstance(v, float) else v for v in record]
+                )
+        return result
+
+
+async def run_plotloop(
+    specs: Sequence[FileSpec],
+    plotter: Plotter,
+    campi: Campi,
+    ev_correction: int = 1,
+    paper_roll_distance: int = 6,
+    walk_distance: float = 3,
+    postprocess: dict[str, Any] | None = None,
+    cache: HashCache | None = None,
+    overlap_walk_back: bool = False,
+    keep_raw: bool = False,
+    log: TimingLog | None = None,
+) -> None:
+    """Plot, capture and advance each frame, overlapping the upload of the next frame and the
+    processing of the previous one with the current plot.
+
+    The pictures are saved as the plotted images. With ``postprocess`` parameters, the server
+    crops and tones them, and the result is saved as the post-processed images instead. The
+    unprocessed pictures are then only saved with ``keep_raw``, as they are fetched from the
+    server's frame buffer, which transfers much more data.
+
+    With a ``cache``, frames are skipped when their images were made from the current content
+    of their source SVG, so that only edited frames are plotted again. Without one, frames
+    whose images exist are skipped. Either way, an interrupted run can be resumed.
+
+    The camera's exposure is set for the next frame while the paper is fed. By default, the
+    carriage walks back before the paper is fed, as the plotter always did. With
+    ``overlap_walk_back``, it walks back while the paper is fed, which saves time but is only
+    safe if the pen can't touch the moving paper.
+    """
+
+    def _outputs(spec: FileSpec) -> list[pathlib.Path]:
+        if not postprocess:
+            return [spec.plotted]
+        return [spec.plotted, spec.postprocessed] if keep_raw else [spec.postprocessed]
+
+    def _is_done(spec: FileSpec) -> bool:
+        if cache is None:
+            return all(path.exists() for path in _outputs(spec))
+        return all(cache.is_fresh(path, keys[spec.frame]) for path in _outputs(spec))
+
+    keys = {spec.frame: file_hash([spec.source], "plot") for spec in specs}
+    log = log or TimingLog()
+    specs = [spec for spec in specs if not _is_done(spec)]
+    if not specs:
+        return
+
+    async def _process(spec: FileSpec, image: bytes, index: int) -> None:
+        if postprocess:
+            spec.postprocessed.write_bytes(image)
+            if keep_raw:
+                spec.plotted.write_bytes(await campi.frame(index))
+        else:
+            spec.plotted.write_bytes(image)
+
+        if cache is not None:
+            for path in _outputs(spec):
+                cache.update(path, keys[spec.frame])
+
+    upload = asyncio.create_task(
+        log.time(specs[0].frame, "upload", plotter.upload(specs[0].source))
+    )
+    process = None
+    try:
+        for i, spec in enumerate(specs):
+            remote_path = await upload
+            if i + 1 < len(specs):
+                upload = asyncio.create_task(
+                    log.time(specs[i + 1].frame, "upload", plotter.upload(specs[i + 1].source))
+                )
+
+            await log.time(spec.frame, "plot", plotter.plot(remote_path))
+            await log.time(spec.frame, "walk_out", plotter.walk_y(-walk_distance))
+            image, index = await log.time(
+                spec.frame,
+                "capture",
+                campi.capture(ev_correction, keep_raw, **(postprocess or {})),
+            )
+
+            walk_back = log.time(spec.frame, "walk_back", plotter.walk_y(walk_distance))
+            feed = [
+                log.time(spec.frame, "advance", campi.advance(paper_roll_distance)),
+                log.time(spec.frame, "exposure", campi.set_exposure(ev_correction)),
+            ]
+            if overlap_walk_back:
+                await asyncio.gather(walk_back, *feed)
+            else:
+                await walk_back
+                await asyncio.gather(*feed)
+
+            if process is not None:
+                await process
+            process = asyncio.create_task(
+                log.time(spec.frame, "process", _process(spec, image, index))
+            )
+
+        await process
+    finally:
+        # don't leave the upload or processing in flight when a stage failed
+        pending = [task for task in (upload, process) if task is not None and not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    total = time.perf_counter() - log.start
+    print(f"plotted {len(specs)} frames in {total:.1f}s ({total / len(specs):.1f}s/frame)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot SVG frames with the plotloop machine.")
+    parser.add_argument("sources", nargs="+", type=pathlib.Path)
+    parser.add_argument("--standin", action="store_true", help="use the local stand-ins")
+    parser.add_argument("--server", default="http://campi.local:8000")
+    args = parser.parse_args()
+
+    async def _main():
+        if args.standin:
+            from .standin import serve_campi
+
+            campi_url = serve_campi()
+            plotter = Plotter(
+                axicli=f"{sys.executable} -m plotloop.standin",
+                shell=["sh", "-c"],
+                remote_dir=tempfile.mkdtemp(),
+            )
+        else:
+            campi_url = args.server
+            plotter = Plotter()
+
+        specs = [
+            FileSpec(
+                frame=i,
+                source=path,
+                simulated=path.with_name(path.stem + "_simulated.jpg"),
+                plotted=path.with_name(path.stem + "_plotted.jpg"),
+                postprocessed=path.with_name(path.stem + "_postprocessed.jpg"),
+            )
+            for i, path in enumerate(args.sources, 1)
+        ]
+        async with Campi(campi_url) as campi:
+            await run_plotloop(specs, plotter, campi)
+
+    asyncio.run(_main())
@@ -0,0 +1,202 @@
+"""In-process frame pipeline.
+
+Frames are processed by a pool of worker processes, and a content hash of each target's inputs
+is recorded so that only the frames whose inputs changed are rebuilt.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import pathlib
+import time
+from typing import Any, Callable, Iterable, Sequence
+
+from multiprocess import Pool
+from PIL import Image
+
+from .gif import GifWriter
+from .raster import rasterize_documents
+
+# bump to invalidate all cached targets
+PIPELINE_VERSION = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class FileSpec:
+    """Files involved in the processing of a single frame."""
+
+    frame: int
+    source: pathlib.Path
+    simulated: pathlib.Path
+    plotted: pathlib.Path
+    postprocessed: pathlib.Path
+
+
+def make_file_specs(
+    directory: pathlib.Path,
+    frames: Iterable[int],
+    source_name: str,
+    base_name: str,
+    postprocessed_suffix: str = "_postprocessed.jpg",
+) -> dict[int, FileSpec]:
+    """Build the file specs of all frames.
+
+    ``source_name`` and ``base_name`` are format strings with a ``frame`` field, used for the
+    source SVG file name and the base name of all other files, respectively.
+    ``postprocessed_suffix`` is appended to the base name for the post-processed images.
+    """
+
+    specs = {}
+    for frame in frames:
+        base = base_name.format(frame=frame)
+        specs[frame] = FileSpec(
+            frame=frame,
+            source=directory / source_name.format(frame=frame),
+            simulated=directory / (base + "_simulated.jpg"),
+            plotted=directory / (base + "_plotted.jpg"),
+            postprocessed=directory / (base + postprocessed_suffix),
+        )
+    return specs
+
+
+def file_hash(paths: Iterable[pathlib.Path], params: Any = None) -> str:
+    """Hash the content of some files, along with some parameters."""
+    digest = hashlib.sha256(repr((PIPELINE_VERSION, params)).encode())
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Persistent record of the input hash each target was last built from."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        try:
+            self._hashes = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._hashes = {}
+
+    def is_fresh(self, target: pathlib.Path, key: str) -> bool:
+        return target.exists() and self._hashes.get(str(target)) == key
+
+    def update(self, target: pathlib.Path, key: str) -> None:
+        self._hashes[str(target)] = key
+
+        # saved after each target so that an interrupted run can be resumed
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._hashes, indent=2))
+        tmp_path.replace(self.path)
+
+
+def simulate_sketch(
+    sketch_path: pathlib.Path,
+    frames: dict[int, pathlib.Path],
+    cache: HashCache,
+    params: dict[str, Any] | None = None,
+    deps: Sequence[pathlib.Path] = (),
+    height: int = 200,
+    pen_width: float | None = None,
+    chunk_size: int = 10,
+    processes: int | None = None,
+) -> None:
+    """Simulate the frames of an animated sketch, without going through SVG files.
+
+    The sketch is executed with its ``frame`` parameter set to each of ``frames``' keys (and
+    its other parameters set to ``params``), and the resulting documents are rasterized to
+    the corresponding paths. Frames are processed by chunks of ``chunk_size`` by a pool of
+    worker processes, and only frames whose inputs (sketch file, ``deps``, parameters)
+    changed are rebuilt.
+    """
+
+    from vsketch_cli.utils import load_sketch_class
+
+    # load_sketch_class() changes the working directory, so relative paths would break
+    sketch_path = pathlib.Path(sketch_path).resolve()
+    params = params or {}
+    keys = {
+        frame: file_hash(
+            [sketch_path, *deps], ("simulate_sketch", params, frame, height, pen_width)
+        )
+        for frame in frames
+    }
+    stale = [
+        frame for frame, target in frames.items() if not cache.is_fresh(target, keys[frame])
+    ]
+    chunks = [stale[i : i + chunk_size] for i in range(0, len(stale), chunk_size)]
+
+    def _simulate(chunk: list[int]) -> list[int]:
+        sketch_class = load_sketch_class(sketch_path)
+        if sketch_class is None:
+            raise ValueError(f"could not load a sketch class from {sketch_path}")
+        docs = []
+        for frame in chunk:
+            sketch_class.set_param_set({**params, "frame": frame})
+            docs.append(sketch_class.execute(seed=0, finalize=True).vsk.document)
+
+        for frame, img in zip(chunk, rasterize_documents(docs, height, pen_width)):
+            Image.fromarray(img, "L").save(frames[frame])
+        return chunk
+
+    start = time.perf_counter()
+    if chunks:
+        with Pool(processes) as p:
+            for chunk in p.imap(_simulate, chunks):
+                for frame in chunk:
+                    cache.update(frames[frame], keys[frame])
+    elapsed = time.perf_counter() - start
+
+    fps = f", {len(stale) / elapsed:.1f} fps" if stale else ""
+    print(
+        f"simulate: {len(stale)} built, {len(frames) - len(stale)} up to date "
+        f"({elapsed:.2f}s{fps})"
+    )
+
+
+def run_once(
+    func: Callable[..., None],
+    sources: Sequence[pathlib.Path],
+    target: pathlib.Path,
+    cache: HashCache,
+    params: dict[str, Any] | None = None,
+    label: str = "target",
+) -> None:
+    """Run ``func(sources, target, **params)`` if the target is missing or out of date."""
+
+    params = params or {}
+    key = file_hash(sources, (func.__name__, params))
+    if cache.is_fresh(target, key):
+        print(f"{label}: up to date")
+        return
+
+    start = time.perf_counter()
+    func(sources, target, **params)
+    cache.update(target, key)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label}: {len(sources)} frames in {elapsed:.2f}s ({len(sources) / elapsed:.1f} fps)"
+    )
+
+
+def assemble_gif(
+    sources: Sequence[pathlib.Path],
+    target: pathlib.Path,
+    delay: int = 50,
+    scale: float | None = None,
+    shared_palette: bool = False,
+) -> None:
+    """Assemble frames into a looping GIF animation.
+
+    Frames are read and encoded one at a time, so memory use stays flat regardless of the
+    number of frames. ``delay`` is the frame duration in milliseconds, and ``scale``
+    optionally resizes the frames.
+    """
+
+    with GifWriter(target, delay=delay, shared_palette=shared_palette) as gif:
+        for path in sources:
+            with Image.open(path) as img:
+                if scale is not None:
+                    img = img.resize((round(img.width * scale), round(img.height * scale)))
+                gif.append(img)
@@ -0,0 +1,67 @@
+"""Local stand-ins for the plotloop machine's hardware, for testing without the Raspberry Pis.
+
+- :func:`load_campi` loads the actual campi server (``world/campi/campi.py``) with its fake
+  camera and motor backends, and :func:`serve_campi` serves it in a background thread.
+- Running this module mimics ``axicli``, simulating the plot and walk durations.
+
+Usage:
+
+    python -m plotloop.standin [axicli arguments]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import pathlib
+import sys
+import threading
+import time
+import types
+
+CAMPI_DIR = pathlib.Path(__file__).parent.parent / "world" / "campi"
+
+# simulated durations, in seconds
+PLOT_DURATION = 0.5
+WALK_DURATION = 0.05
+
+
+def load_campi() -> types.ModuleType:
+    """Import the campi server module, with the fake camera and motor backends."""
+    os.environ["CAMPI_CAMERA"] = "fake"
+    os.environ["CAMPI_MOTOR"] = "fake"
+    if str(CAMPI_DIR) not in sys.path:
+        sys.path.append(str(CAMPI_DIR))
+    return importlib.import_module("campi")
+
+
+def serve_campi(port: int = 0) -> str:
+    """Serve the campi stand-in with uvicorn in a background thread (``port=0`` picks a free
+    port), and return its URL."""
+    import uvicorn
+
+    config = uvicorn.Config(load_campi().app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="axicli stand-in")
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("-m", "--mode", default="plot")
+    parser.add_argument("-M", "--manual_cmd")
+    parser.add_argument("--walk_dist", type=float)
+    args, _ = parser.parse_known_args()
+
+    if args.mode == "plot":
+        with open(args.file) as fp:
+            fp.read()
+        time.sleep(PLOT_DURATION)
+    elif args.mode == "manual":
+        time.sleep(WALK_DURATION)
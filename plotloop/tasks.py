@@ -0,0 +1,180 @@
+"""Doit task bodies shared by the ``world`` and ``warp`` dodo files."""
+
+from __future__ import annotations
+
+import pathlib
+from typing import Any, Iterable, Sequence
+
+import vpype as vp
+from doit.tools import config_changed
+
+from .pipeline import FileSpec, HashCache, assemble_gif, run_once, simulate_sketch
+
+
+def _cache(specs: Iterable[FileSpec]) -> HashCache:
+    output_dir = next(iter(specs)).source.parent
+    return HashCache(output_dir / ".plotloop_cache.json")
+
+
+def simulate_task(
+    specs: dict[int, FileSpec],
+    sketch_path: pathlib.Path,
+    target: pathlib.Path,
+    params: dict[str, Any] | None = None,
+    deps: Sequence[pathlib.Path] = (),
+    pen_width: str | None = None,
+    height: int = 200,
+    delay: int = 50,
+) -> dict:
+    """Simulate all frames straight from the sketch and assemble them into an animation."""
+
+    def _simulate():
+        cache = _cache(specs.values())
+        simulate_sketch(
+            sketch_path,
+            {frame: spec.simulated for frame, spec in specs.items()},
+            cache,
+            params=params,
+            deps=deps,
+            height=height,
+            pen_width=vp.convert_length(pen_width) if pen_width is not None else None,
+        )
+        run_once(
+            assemble_gif,
+            [spec.simulated for spec in specs.values()],
+            target,
+            cache,
+            params={"delay": delay},
+            label="animation",
+        )
+
+    return {
+        "actions": [_simulate],
+        "file_dep": [sketch_path, *deps],
+        "targets": [spec.simulated for spec in specs.values()] + [target],
+        "clean": True,
+    }
+
+
+def plot_task(
+    specs: dict[int, FileSpec],
+    axidraw_host: str,
+    axicli: str,
+    campi_server: str,
+    ev_correction: int,
+    paper_roll_distance: int,
+    postprocess: dict[str, Any] | None = None,
+    overlap_walk_back: bool = False,
+    keep_raw: bool = False,
+) -> dict:
+    """Plot the plotter-ready SVGs, take a picture of each, and advance the paper.
+
+    The pictures are saved as the plotted images. With ``postprocess`` parameters (see
+    ``world/campi/postprocess.py``), they are cropped and toned by the campi server and saved
+    as the post-processed images instead, and the plotted images are only kept with
+    ``keep_raw``. Only the frames whose source SVG changed since they were last plotted are
+    plotted again, and an interrupted run resumes where it stopped.
+
+    See :func:`plotloop.orchestrator.run_plotloop` for ``overlap_walk_back``.
+    """
+
+    def _plot():
+        import asyncio
+
+        from .orchestrator import Campi, Plotter, TimingLog, run_plotloop
+
+        async def _run():
+            async with Campi(campi_server) as campi:
+                await run_plotloop(
+                    list(specs.values()),
+                    Plotter(axidraw_host, axicli),
+                    campi,
+                    ev_correction=ev_correction,
+                    paper_roll_distance=paper_roll_distance,
+                    postprocess=postprocess,
+                    cache=_cache(specs.values()),
+                    overlap_walk_back=overlap_walk_back,
+                    keep_raw=keep_raw,
+                    log=TimingLog(
+                        next(iter(specs.values())).plotted.parent / "plot_timing.csv"
+                    ),
+                )
+
+        asyncio.run(_run())
+
+    targets = []
+    if not postprocess or keep_raw:
+        targets += [spec.plotted for spec in specs.values()]
+    if postprocess:
+        targets += [spec.postprocessed for spec in specs.values()]
+
+    return {
+        "actions": [_plot],
+        "file_dep": [spec.source for spec in specs.values()],
+        "targets": targets,
+        "clean": True,
+    }
+
+
+def postprocess_tasks(specs: dict[int, FileSpec], postprocess: dict[str, Any]):
+    """Redo the post-processing of the plotted images locally with ImageMagick, e.g. after
+    adjusting the parameters, without plotting again.
+
+    The parameters are the campi server's, whose semantics follow ImageMagick's. The plotted
+    images must have been kept (see ``plot_task``'s ``keep_raw``). As these tasks overwrite
+    the post-processed images of ``plot_task``, they must be left out of the dodo file's
+    default tasks, and only run explicitly.
+    """
+
+    options = []
+    if postprocess.get("rotate"):
+        options.append(f"-rotate {postprocess['rotate']}")
+    if postprocess.get("crop"):
+        options.append(f"-crop {postprocess['crop']}")
+    if postprocess.get("gray"):
+        options.append("-colorspace Gray")
+    if postprocess.get("brightness_contrast"):
+        options.append(f"-brightness-contrast {postprocess['brightness_contrast']}")
+    convert_options = " ".join(options)
+
+    for frame, spec in specs.items():
+        yield {
+            "name": f"{frame:04d}",
+            "actions": [f"convert '{spec.plotted}' {convert_options} '{spec.postprocessed}'"],
+            "file_dep": [spec.plotted],
+            "uptodate": [config_changed(convert_options)],
+        }
+
+
+def animation_task(
+    specs: dict[int, FileSpec],
+    target: pathlib.Path,
+    scale: float | None = None,
+    delay: int = 50,
+) -> dict:
+    """Assemble the post-processed frames into the final animation."""
+
+    def _animation():
+        run_once(
+            assemble_gif,
+            [spec.postprocessed for spec in specs.values()],
+            target,
+            _cache(specs.values()),
+            params={"delay": delay, "scale": scale},
+            label="animation",
+        )
+
+    return {
+        "actions": [_animation],
+        "file_dep": [spec.postprocessed for spec in specs.values()],
+        "targets": [target],
+        "clean": True,
+    }
+
+
+def toggle_task(axicli: str) -> dict:
+    return {"actions": [f"{axicli} -m toggle"]}
+
+
+def disable_xy_task(axicli: str) -> dict:
+    return {"actions": [f"{axicli} -m manual -M disable_xy"]}
@@ -0,0 +1,135 @@
+import importlib
+import io
+import os
+import pathlib
+import sys
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "world" / "campi"))
+
+from camera import Camera, FakeCamera, FrameBuffer  # noqa: E402
+from motor import STEPS_PER_CM, FakeMotor, JobStatus, Motor, MotorQueue  # noqa: E402
+
+
+@pytest.fixture
+def fake_camera():
+    return FakeCamera(size=(320, 240), delay=0)
+
+
+@pytest.fixture(scope="module")
+def campi():
+    os.environ["CAMPI_CAMERA"] = "fake"
+    os.environ["CAMPI_MOTOR"] = "fake"
+    campi = importlib.import_module("campi")
+    campi.camera = FakeCamera(size=(320, 240), delay=0)
+    return campi
+
+
+@pytest.fixture
+def client(campi):
+    campi.frame_buffer = FrameBuffer(3)
+    campi.motor_queue = MotorQueue(FakeMotor(step_delay=0))
+    # not used as a context manager, which would shut the module's motor queue down
+    return TestClient(campi.app)
+
+
+def test_camera_is_abstract():
+    with pytest.raises(TypeError):
+        Camera()
+
+
+def test_fake_camera(fake_camera):
+    img = Image.open(io.BytesIO(fake_camera.capture(ev=1)))
+
+    assert img.format == "JPEG"
+    assert img.size == (320, 240)
+    assert fake_camera.capture_count == 1
+
+
+def test_fake_camera_burst(fake_camera):
+    datas = fake_camera.burst([-1, 0, 1])
+
+    assert len(datas) == 3
+    assert fake_camera.capture_count == 3
+    # the exposure value shows in the pictures' brightness
+    brightness = [Image.open(io.BytesIO(data)).convert("L").getpixel((0, 0)) for data in datas]
+    assert brightness == sorted(brightness)
+
+
+def test_frame_buffer():
+    buffer = FrameBuffer(2)
+    for ev in range(3):
+        buffer.append(ev, bytes([ev]))
+
+    assert [frame.index for frame in buffer.frames()] == [2, 3]
+    assert buffer.get(1) is None
+    assert buffer.get(3).data == bytes([2])
+
+
+def test_burst(client):
+    response = client.get("/burst/", params={"ev": [-2, 0, 2]})
+    assert response.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        names = archive.namelist()
+        assert names == ["00_frame_1_ev_-2.jpg", "01_frame_2_ev_0.jpg", "02_frame_3_ev_2.jpg"]
+        assert Image.open(io.BytesIO(archive.read(names[0]))).size == (320, 240)
+
+
+def test_frames(client):
+    for _ in range(4):
+        last = client.get("/img/")
+
+    frames = client.get("/frames/").json()
+    assert [frame["index"] for frame in frames] == [2, 3, 4]
+
+    response = client.get("/frames/4")
+    assert response.headers["X-Frame-Index"] == "4"
+    assert response.content == last.content
+    assert client.get("/frames/1").status_code == 404
+
+
+def test_motor_is_abstract():
+    with pytest.raises(TypeError):
+        Motor()
+
+
+def test_motor_queue():
+    queue = MotorQueue(FakeMotor(step_delay=0), history=2)
+    jobs = [queue.submit(cm) for cm in (1, 2, 3)]
+    jobs[-1].future.result()
+    queue.close()
+
+    assert all(job.status == JobStatus.DONE for job in jobs)
+    assert queue.motor.position == sum(job.steps for job in jobs)
+    assert jobs[1].steps == round(2 * STEPS_PER_CM)
+    assert [job.id for job in queue.jobs()] == [2, 3]
+    assert queue.get(1) is None
+
+
+def test_motor_jobs(client):
+    job = client.get("/motor/2", params={"wait": False}).json()
+    assert job["status"] in ("queued", "running")
+
+    done = client.get(f"/motor/jobs/{job['id']}/wait").json()
+    assert done["status"] == "done"
+    assert done["finished"] >= done["started"] >= done["submitted"]
+
+    assert client.get("/motor/3").json()["status"] == "done"
+    assert [job["cm"] for job in client.get("/motor/jobs/").json()] == [2, 3]
+    assert client.get(f"/motor/jobs/{job['id']}").json() == done
+    assert client.get("/motor/jobs/1000").status_code == 404
+
+
+@pytest.mark.parametrize("keep_raw", [False, True])
+def test_img_postprocess(client, keep_raw):
+    params = {"crop": "100x50+10+10", "gray": True, "keep_raw": keep_raw}
+    response = client.get("/img/", params=params)
+    assert Image.open(io.BytesIO(response.content)).size == (100, 50)
+
+    kept = client.get(f"/frames/{response.headers['X-Frame-Index']}").content
+    assert Image.open(io.BytesIO(kept)).size == ((320, 240) if keep_raw else (100, 50))
@@ -0,0 +1,31 @@
+import pathlib
+import sys
+
+import numpy as np
+from shapely.geometry import Point
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "machine_typography"))
+
+from sketch_machine_typography import even_odd_polygon  # noqa: E402
+
+
+def _square(x, y, size):
+    return np.array([x, x + size, x + size + size * 1j, x + size * 1j]) + y * 1j
+
+
+def test_even_odd_polygon_nested():
+    # square with a hole, containing an island
+    poly = even_odd_polygon([_square(0, 0, 10), _square(2, 2, 6), _square(4, 4, 2)])
+
+    assert poly.is_valid
+    assert poly.geom_type == "MultiPolygon"
+    assert poly.area == 100 - 36 + 4
+
+
+def test_even_odd_polygon_overlapping_contours():
+    # crossing contours, as in fonts whose outlines overlap
+    poly = even_odd_polygon([_square(0, 0, 10), _square(5, 5, 10), _square(6, 1, 2)])
+
+    assert poly.is_valid
+    assert poly.area == 100 + 100 - 2 * 25 - 4
+    assert not poly.contains(Point(7, 7))
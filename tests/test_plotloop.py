@@ -0,0 +1,110 @@
+import asyncio
+import sys
+
+import httpx
+import pytest
+from PIL import Image
+from plotloop import standin
+from plotloop.orchestrator import Campi, CommandError, Plotter, TimingLog, run_plotloop
+from plotloop.pipeline import HashCache, make_file_specs
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg"><circle cx="{r}" cy="{r}" r="{r}"/></svg>'
+
+
+@pytest.fixture
+def specs(tmp_path):
+    specs = make_file_specs(
+        tmp_path, range(1, 4), "frame_{frame:04d}.svg", "frame_{frame:04d}"
+    )
+    for frame, spec in specs.items():
+        spec.source.write_text(SVG.format(r=frame))
+    return specs
+
+
+@pytest.fixture(scope="module")
+def campi_app():
+    campi = standin.load_campi()
+    campi.camera = sys.modules["camera"].FakeCamera(size=(320, 240), delay=0)
+    return campi.app
+
+
+def _campi(app):
+    return Campi("http://campi", transport=httpx.ASGITransport(app=app))
+
+
+def _plotter(tmp_path, axicli=f"{sys.executable} {standin.__file__}"):
+    return Plotter(axicli=axicli, shell=["sh", "-c"], remote_dir=str(tmp_path))
+
+
+def _plot(specs, plotter, campi_app, cache=None, **kwargs):
+    async def _run():
+        log = TimingLog()
+        async with _campi(campi_app) as campi:
+            await run_plotloop(
+                list(specs.values()), plotter, campi, cache=cache, log=log, **kwargs
+            )
+        return log
+
+    return asyncio.run(_run())
+
+
+def _plotted_frames(log):
+    return [frame for frame, stage, *_ in log.records if stage == "plot"]
+
+
+def test_run_plotloop(tmp_path, specs, campi_app):
+    log = _plot(specs, _plotter(tmp_path), campi_app)
+
+    assert _plotted_frames(log) == [1, 2, 3]
+    assert all(spec.plotted.stat().st_size > 0 for spec in specs.values())
+
+
+@pytest.mark.parametrize("overlap_walk_back", [False, True])
+def test_run_plotloop_walk_back(tmp_path, specs, campi_app, overlap_walk_back):
+    log = _plot(specs, _plotter(tmp_path), campi_app, overlap_walk_back=overlap_walk_back)
+
+    stages = {
+        (frame, stage): (begin, begin + duration)
+        for frame, stage, begin, duration in log.records
+    }
+    for frame in specs:
+        walk_back_end = stages[frame, "walk_back"][1]
+        advance_start = stages[frame, "advance"][0]
+        assert (advance_start < walk_back_end) == overlap_walk_back
+        assert stages[frame, "exposure"][0] > stages[frame, "capture"][1]
+
+
+@pytest.mark.parametrize("keep_raw", [False, True])
+def test_run_plotloop_postprocess(tmp_path, specs, campi_app, keep_raw):
+    postprocess = {"rotate": 90, "crop": "100x50+0+0"}
+    _plot(specs, _plotter(tmp_path), campi_app, postprocess=postprocess, keep_raw=keep_raw)
+
+    for spec in specs.values():
+        assert Image.open(spec.postprocessed).size == (100, 50)
+        if keep_raw:
+            assert Image.open(spec.plotted).size == (320, 240)
+        else:
+            assert not spec.plotted.exists()
+
+
+def test_run_plotloop_replots_edited_frames(tmp_path, specs, campi_app):
+    cache = HashCache(tmp_path / "cache.json")
+    _plot(specs, _plotter(tmp_path), campi_app, cache)
+
+    specs[2].source.write_text(SVG.format(r=10))
+    log = _plot(specs, _plotter(tmp_path), campi_app, HashCache(tmp_path / "cache.json"))
+
+    assert _plotted_frames(log) == [2]
+
+
+def test_run_plotloop_failure(tmp_path, specs, campi_app):
+    async def _run():
+        async with _campi(campi_app) as campi:
+            with pytest.raises(CommandError):
+                await run_plotloop(
+                    list(specs.values()), _plotter(tmp_path, axicli="false"), campi
+                )
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(_run()) == set()
+    assert not any(spec.plotted.exists() for spec in specs.values())
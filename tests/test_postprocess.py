@@ -0,0 +1,85 @@
+import pathlib
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "world" / "campi"))
+
+from postprocess import (  # noqa: E402
+    Postprocess,
+    brightness_contrast_lut,
+    parse_brightness_contrast,
+    parse_geometry,
+)
+
+
+def test_parse_geometry():
+    assert parse_geometry("1900x1900+605+785") == (605, 785, 2505, 2685)
+    assert parse_geometry("10x20-5+3") == (-5, 3, 5, 23)
+    with pytest.raises(ValueError):
+        parse_geometry("1900x1900")
+
+
+def test_parse_brightness_contrast():
+    assert parse_brightness_contrast("5x15") == (5, 15)
+    assert parse_brightness_contrast("-10") == (-10, 0)
+    with pytest.raises(ValueError):
+        parse_brightness_contrast("5x")
+
+
+# values of ImageMagick's BrightnessContrastImage(), i.e. `-brightness-contrast BxC`, which
+# maps u to tan(pi * (C / 100 + 1) / 4) * u + B / 100 + (100 - B) / 200 * (1 - slope)
+@pytest.mark.parametrize(
+    ("brightness", "contrast", "values"),
+    [
+        (0, 0, [0, 32, 64, 128, 192, 255]),
+        (5, 15, [0, 21, 61, 143, 224, 255]),
+        (-10, 0, [0, 7, 39, 102, 166, 229]),
+        (0, -50, [75, 88, 101, 128, 154, 180]),
+    ],
+)
+def test_brightness_contrast_lut(brightness, contrast, values):
+    lut = brightness_contrast_lut(brightness, contrast)
+    assert [lut[i] for i in (0, 32, 64, 128, 192, 255)] == values
+
+
+def _image():
+    # 3x2 image with a distinct value per pixel
+    img = Image.new("RGB", (3, 2))
+    img.putdata([(v, v, v) for v in (10, 20, 30, 40, 50, 60)])
+    return img
+
+
+def test_postprocess_rotate():
+    # like ImageMagick's -rotate, positive angles are clockwise
+    img = Postprocess(rotate=90).apply(_image())
+    assert img.size == (2, 3)
+    assert img.getpixel((1, 0)) == (10, 10, 10)
+    assert img.getpixel((0, 0)) == (40, 40, 40)
+
+    assert Postprocess(rotate=-90).apply(_image()).getpixel((0, 2)) == (10, 10, 10)
+
+
+def test_postprocess_crop():
+    img = Postprocess(crop="2x1+1+1").apply(_image())
+    assert list(img.getdata()) == [(50, 50, 50), (60, 60, 60)]
+
+    # like ImageMagick, the crop is clipped to the image
+    assert Postprocess(crop="10x10+2+0").apply(_image()).size == (1, 2)
+
+
+def test_postprocess_gray_brightness_contrast():
+    img = Postprocess(gray=True, brightness_contrast="-10").apply(_image())
+    assert img.mode == "L"
+    # v - 25.5, clamped
+    assert list(img.getdata()) == [0, 0, 5, 15, 25, 35]
+
+
+def test_postprocess_validation():
+    assert Postprocess(rotate=360).is_identity
+    assert not Postprocess(gray=True).is_identity
+    with pytest.raises(ValueError):
+        Postprocess(rotate=45)
+    with pytest.raises(ValueError):
+        Postprocess(crop="1x1")
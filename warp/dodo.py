@@ -1,42 +1,52 @@
 # doit script
 
-import dataclasses
 import pathlib
+import sys
 
 CUR_DIR = pathlib.Path(__file__).parent
+sys.path.append(str(CUR_DIR.parent))
+
+import plotloop.tasks
+from plotloop import make_file_specs
 
 PAPER_ROLL_DIST = 6
 EV = 1
 
 VPYPE = CUR_DIR.parent / "venv/bin/vpype"
 
-AXICLI = f"ssh axidraw.local /home/pi/src/taxi/venv/bin/axicli -L 2 -d 37 -u 60 -N"
+AXIDRAW_HOST = "axidraw.local"
+AXICLI_REMOTE = "/home/pi/src/taxi/venv/bin/axicli -L 2 -d 37 -u 60 -N"
+AXICLI = f"ssh {AXIDRAW_HOST} {AXICLI_REMOTE}"
 CAMPI_SERVER = "http://campi.local:8000"
 
-FRAMES = range(1, 201)
-SOURCE_TEMPLATE = "output/warp_frame_count_200_frame_{}.svg"
-
+# applied by the campi server to the pictures (see campi/postprocess.py), or locally by
+# the postprocess task
+POSTPROCESS = dict(crop="1700x1700+878+584", gray=True, brightness_contrast="5x15")
 
-@dataclasses.dataclass()
-class FileSpec:
-    source: pathlib.Path
-    plotted: pathlib.Path = dataclasses.field(init=False)
-    postprocessed: pathlib.Path = dataclasses.field(init=False)
+# also download the unprocessed pictures, which the postprocess task needs (4x more data)
+KEEP_RAW = False
 
-    def __post_init__(self):
-        self.plotted = self.source.with_name(self.source.stem + "_plotted.jpg")
-        self.postprocessed = self.plotted.with_name(self.plotted.stem + "_postprocessed.jpg")
+# the postprocess task overwrites the plot task's pictures, so it must be run explicitly
+DOIT_CONFIG = {"default_tasks": ["toggle", "disable_xy", "generate", "plot", "plotsim"]}
 
+FRAMES = range(1, 201)
+BASENAME = "warp_frame_count_200"
 
-FILE_SPECS = {i: FileSpec(pathlib.Path(SOURCE_TEMPLATE.format(i))) for i in FRAMES}
+FILE_SPECS = make_file_specs(
+    CUR_DIR / "output",
+    FRAMES,
+    source_name=BASENAME + "_frame_{frame}.svg",
+    base_name=BASENAME + "_frame_{frame}",
+    postprocessed_suffix="_plotted_postprocessed.jpg",
+)
 
 
 def task_toggle():
-    return {"actions": [f"{AXICLI} -m toggle"]}
+    return plotloop.tasks.toggle_task(AXICLI)
 
 
 def task_disable_xy():
-    return {"actions": [f"{AXICLI} -m manual -M disable_xy"]}
+    return plotloop.tasks.disable_xy_task(AXICLI)
 
 
 def task_generate():
@@ -49,45 +59,30 @@ def task_generate():
 
 
 def task_plot():
-    """Plot the plotter-ready SVGs."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                f"cat {spec.source} | {AXICLI} -m plot",
-                f"{AXICLI} -m manual -M walk_y --walk_dist -3",
-                f"curl -s --output {spec.plotted} {CAMPI_SERVER}/img/?ev={EV}",
-                f"{AXICLI} -m manual -M walk_y --walk_dist 3",
-                f"curl -s --output /dev/null {CAMPI_SERVER}/motor/{PAPER_ROLL_DIST}",
-            ],
-            "file_dep": [spec.source],
-            "targets": [spec.plotted],
-        }
+    """Plot the plotter-ready SVGs and capture the post-processed pictures."""
+    return plotloop.tasks.plot_task(
+        FILE_SPECS,
+        AXIDRAW_HOST,
+        AXICLI_REMOTE,
+        CAMPI_SERVER,
+        EV,
+        PAPER_ROLL_DIST,
+        POSTPROCESS,
+        keep_raw=KEEP_RAW,
+    )
 
 
 def task_plotsim():
     """Simulate plotting."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                f"convert {spec.source} -scale 200x200 {spec.postprocessed}",
-            ],
-            "file_dep": [spec.source, __file__],
-        }
+    return plotloop.tasks.simulate_task(
+        FILE_SPECS,
+        CUR_DIR / "sketch_warp.py",
+        CUR_DIR / "output" / f"{BASENAME}.gif",
+        params={"frame_count": 200},
+        pen_width="0.5mm",
+    )
 
 
 def task_postprocess():
-    """Post-process the plotted images."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                (
-                    f"convert '{spec.plotted}' -crop 1700x1700+878+584 -colorspace Gray "
-                    f"-brightness-contrast 5x15 '{spec.postprocessed}'"
-                )
-            ],
-            "file_dep": [spec.plotted, __file__],
-            "targets": [spec.postprocessed],
-        }
+    """Redo the post-processing of the plotted images locally (needs KEEP_RAW)."""
+    yield from plotloop.tasks.postprocess_tasks(FILE_SPECS, POSTPROCESS)
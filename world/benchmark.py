@@ -0,0 +1,73 @@
+"""Benchmark of the world sketch's per-frame geometry processing on the real world data.
+
+Compares the per-line :func:`crop_half_plane` with :func:`crop_half_plane_batch`, and checks
+that both produce identical results.
+
+Usage:
+
+    python benchmark.py [--frame-count 280] [--crop-depth 0.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+
+from sketch_world import (
+    LINES,
+    crop_half_plane,
+    crop_half_plane_batch,
+    frame_angles,
+    rotation_matrices,
+)
+
+
+def crop_per_line(rot: np.ndarray, crop_depth: float) -> list[np.ndarray]:
+    return [
+        cropped_line
+        for line in LINES.rotate(rot)
+        for cropped_line in crop_half_plane(line, crop_depth, axis=0, keep_smaller=False)
+    ]
+
+
+def crop_batch(rot: np.ndarray, crop_depth: float) -> list[np.ndarray]:
+    return list(
+        crop_half_plane_batch(LINES.rotate(rot), crop_depth, axis=0, keep_smaller=False)
+    )
+
+
+def check_identical(a: list[np.ndarray], b: list[np.ndarray]) -> None:
+    if len(a) != len(b) or not all(np.array_equal(x, y) for x, y in zip(a, b)):
+        raise AssertionError("batch crop output differs from per-line crop")
+
+
+def bench(func, rots: np.ndarray, crop_depth: float) -> float:
+    start = time.perf_counter()
+    for rot in rots:
+        func(rot, crop_depth)
+    return (time.perf_counter() - start) / len(rots)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the world sketch geometry.")
+    parser.add_argument("--frame-count", type=int, default=280)
+    parser.add_argument("--crop-depth", type=float, default=0.0)
+    args = parser.parse_args()
+
+    frames = np.arange(1, args.frame_count + 1)
+    rots = rotation_matrices(*frame_angles(frames, args.frame_count))
+
+    for rot in rots:
+        check_identical(crop_per_line(rot, args.crop_depth), crop_batch(rot, args.crop_depth))
+
+    print(f"{len(LINES)} lines, {len(LINES.coords)} points, {len(frames)} frames")
+    t_line = bench(crop_per_line, rots, args.crop_depth)
+    t_batch = bench(crop_batch, rots, args.crop_depth)
+    print(f"crop_half_plane:       {t_line * 1000:7.3f}ms/frame")
+    print(f"crop_half_plane_batch: {t_batch * 1000:7.3f}ms/frame ({t_line / t_batch:.1f}x)")
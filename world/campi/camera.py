@@ -0,0 +1,179 @@
+"""Camera backends for the campi server.
+
+Captures are JPEG-encoded in memory. The ``fake`` backend generates synthetic pictures and
+doesn't need any hardware, for testing the server off the Raspberry Pi.
+"""
+
+from __future__ import annotations
+
+import abc
+import collections
+import dataclasses
+import io
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+
+class Camera(abc.ABC):
+    """Base class for camera backends.
+
+    Changing the exposure and capturing is done under a lock, so that concurrent requests
+    can't interleave.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ev = 0
+
+    @abc.abstractmethod
+    def _set_exposure(self, ev: int) -> None:
+        """Apply an exposure value correction to the hardware."""
+
+    @abc.abstractmethod
+    def _capture_image(self) -> Image.Image:
+        """Capture an RGB picture."""
+
+    def _capture(self) -> bytes:
+        buffer = io.BytesIO()
+        self._capture_image().save(buffer, "JPEG")
+        return buffer.getvalue()
+
+    def _apply_exposure(self, ev: int) -> None:
+        if ev != self._ev:
+            self._set_exposure(ev)
+            self._ev = ev
+
+    def _capture_ev(self, ev: int) -> bytes:
+        self._apply_exposure(ev)
+        return self._capture()
+
+    def set_exposure(self, ev: int) -> None:
+        """Set the exposure value correction ahead of the next capture, to give the camera
+        time to settle."""
+        with self._lock:
+            self._apply_exposure(ev)
+
+    def capture(self, ev: int = 0) -> bytes:
+        """Capture a JPEG-encoded picture with the provided exposure value correction."""
+        with self._lock:
+            return self._capture_ev(ev)
+
+    def capture_image(self, ev: int = 0) -> Image.Image:
+        """Capture an unencoded picture, for further processing."""
+        with self._lock:
+            self._apply_exposure(ev)
+            return self._capture_image()
+
+    def burst(self, evs: list[int]) -> list[bytes]:
+        """Capture several pictures in a row (e.g. an exposure bracket), without letting
+        other requests interleave."""
+        with self._lock:
+            return [self._capture_ev(ev) for ev in evs]
+
+    def close(self) -> None:
+        pass
+
+
+class PiCamera(Camera):
+    def __init__(self):
+        super().__init__()
+
+        from picamera2 import Picamera2
+
+        self._picam2 = Picamera2()
+        still_config = self._picam2.create_still_configuration(controls={"ExposureValue": 0})
+        self._picam2.configure(still_config)
+        self._picam2.start()
+
+    def _set_exposure(self, ev: int) -> None:
+        self._picam2.set_controls({"ExposureValue": ev})
+
+    def _capture_image(self) -> Image.Image:
+        return self._picam2.capture_image("main").convert("RGB")
+
+    def _capture(self) -> bytes:
+        buffer = io.BytesIO()
+        self._picam2.capture_file(buffer, format="jpeg")
+        return buffer.getvalue()
+
+    def close(self) -> None:
+        self._picam2.stop()
+
+
+class FakeCamera(Camera):
+    """Synthetic camera, whose pictures show the capture count and exposure value."""
+
+    def __init__(self, size: tuple[int, int] = (4056, 3040), delay: float = 0.1):
+        super().__init__()
+        self.size = size
+        self.delay = delay
+        self.capture_count = 0
+
+    def _set_exposure(self, ev: int) -> None:
+        pass
+
+    def _capture_image(self) -> Image.Image:
+        time.sleep(self.delay)
+        self.capture_count += 1
+        ev = self._ev
+
+        width, height = self.size
+        img = Image.new("L", self.size, max(0, min(255, 180 + 25 * ev)))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse(
+            (width / 2 - height / 3, height / 6, width / 2 + height / 3, 5 * height / 6),
+            outline=0,
+            width=5,
+        )
+        draw.text((20, 20), f"capture {self.capture_count} ev {ev}", fill=0)
+        return img.convert("RGB")
+
+
+BACKENDS = {"picamera2": PiCamera, "fake": FakeCamera}
+
+
+def open_camera(backend: str) -> Camera:
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(
+            f"unknown camera backend '{backend}' (must be one of: {', '.join(BACKENDS)})"
+        ) from None
+
+
+@dataclasses.dataclass(frozen=True)
+class Frame:
+    index: int
+    timestamp: float
+    ev: int
+    data: bytes
+
+
+class FrameBuffer:
+    """Thread-safe ring buffer of the most recent captures."""
+
+    def __init__(self, size: int):
+        self._frames: collections.deque[Frame] = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def append(self, ev: int, data: bytes) -> Frame:
+        with self._lock:
+            self._count += 1
+            frame = Frame(self._count, time.time(), ev, data)
+            self._frames.append(frame)
+        return frame
+
+    def frames(self) -> list[Frame]:
+        with self._lock:
+            return list(self._frames)
+
+    def get(self, index: int) -> Frame | None:
+        """Return a frame by index, or None if it is not (or no longer) in the buffer."""
+        with self._lock:
+            for frame in self._frames:
+                if frame.index == index:
+                    return frame
+        return None
@@ -3,56 +3,155 @@
 Details: https://bylr.info/articles/2022/12/22/automatic-plotloop-machine/
 """
 
-import RPi.GPIO as GPIO
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from picamera2 import Picamera2
-from RpiMotorLib import RpiMotorLib
+import asyncio
+import io
+import os
+import pathlib
+import sys
+import zipfile
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+
+from camera import FrameBuffer, open_camera
+from motor import MotorQueue, open_motor
+from postprocess import Postprocess, encode_jpeg
+
+# camera backend ("picamera2" or "fake"), motor driver ("rpi" or "fake"), and number of recent
+# captures kept in memory
+CAMERA_BACKEND = os.environ.get("CAMPI_CAMERA", "picamera2")
+MOTOR_DRIVER = os.environ.get("CAMPI_MOTOR", "rpi")
+FRAME_BUFFER_SIZE = int(os.environ.get("CAMPI_FRAME_BUFFER_SIZE", "10"))
 
 app = FastAPI()
 
 # Initialize the motor
-PIN_ENABLE = 5
-PIN_MS1 = 6
-PIN_MS2 = 13
-PIN_DIR = 26
-PIN_STEP = 19
-
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(PIN_ENABLE, GPIO.OUT, initial=GPIO.HIGH)
-GPIO.output(PIN_ENABLE, GPIO.HIGH)
-motor_control = RpiMotorLib.A3967EasyNema(PIN_DIR, PIN_STEP, (PIN_MS1, PIN_MS2))
+motor_queue = MotorQueue(open_motor(MOTOR_DRIVER))
 
 # Initialize the camera
-picam2 = Picamera2()
-still_config = picam2.create_still_configuration(controls={"ExposureValue": 0})
-picam2.configure(still_config)
-picam2.start()
+camera = open_camera(CAMERA_BACKEND)
+frame_buffer = FrameBuffer(FRAME_BUFFER_SIZE)
+
+
+def _jpeg_response(data: bytes, index: int) -> Response:
+    return Response(data, media_type="image/jpeg", headers={"X-Frame-Index": str(index)})
 
 
 @app.get("/img/")
-def get_picture(ev: int = 0):
-    picam2.set_controls({"ExposureValue": ev})
-    array = picam2.capture_file("/tmp/temp.jpg")
-    return FileResponse("/tmp/temp.jpg", media_type="image/png")
+def get_picture(
+    ev: int = 0,
+    rotate: int = 0,
+    crop: Optional[str] = None,
+    gray: bool = False,
+    brightness_contrast: Optional[str] = None,
+    quality: int = Query(90, ge=1, le=100),
+    keep_raw: bool = False,
+):
+    """Capture a picture, optionally post-processed with the same parameters as ImageMagick's
+    ``-rotate``, ``-crop WxH+X+Y``, ``-colorspace Gray`` and ``-brightness-contrast BxC``.
+
+    The picture is kept in the frame buffer, under the index returned in the ``X-Frame-Index``
+    header. With ``keep_raw``, the unprocessed picture is kept instead, so that it can be
+    fetched later from ``/frames/{index}``."""
+    try:
+        postprocess = Postprocess(rotate, crop, gray, brightness_contrast)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    if postprocess.is_identity:
+        data = raw_data = camera.capture(ev)
+    else:
+        # processed before encoding, so that the picture is only compressed once
+        img = camera.capture_image(ev)
+        data = encode_jpeg(postprocess.apply(img), quality)
+        raw_data = encode_jpeg(img, quality) if keep_raw else data
+    frame = frame_buffer.append(ev, raw_data)
+    return _jpeg_response(data, frame.index)
+
+
+@app.get("/burst/")
+def get_burst(ev: list[int] = Query([-1, 0, 1])):
+    """Capture one picture per exposure value, returned as a (uncompressed) ZIP archive."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for i, (value, data) in enumerate(zip(ev, camera.burst(ev))):
+            frame = frame_buffer.append(value, data)
+            archive.writestr(f"{i:02d}_frame_{frame.index}_ev_{value}.jpg", data)
+    return Response(buffer.getvalue(), media_type="application/zip")
+
+
+@app.get("/frames/")
+def list_frames():
+    """List the recent captures held in memory."""
+    return [
+        {
+            "index": frame.index,
+            "timestamp": frame.timestamp,
+            "ev": frame.ev,
+            "size": len(frame.data),
+        }
+        for frame in frame_buffer.frames()
+    ]
+
+
+@app.get("/frames/{index}")
+def get_frame(index: int):
+    """Return a recent capture without taking a new picture."""
+    frame = frame_buffer.get(index)
+    if frame is None:
+        raise HTTPException(status_code=404, detail=f"frame {index} not in buffer")
+    return _jpeg_response(frame.data, frame.index)
+
+
+@app.get("/exposure/")
+def set_exposure(ev: int = 0):
+    """Set the exposure value ahead of the next capture (e.g. while the paper is fed)."""
+    camera.set_exposure(ev)
+    return {"ev": ev}
+
+
+def _get_job(job_id: int):
+    job = motor_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"unknown motor job {job_id}")
+    return job
 
 
 @app.get("/motor/{cm}")
-def run_motor(cm: int):
-    GPIO.output(PIN_ENABLE, GPIO.LOW)
-    kwargs = dict(
-        stepdelay=0.005,
-        steps=round(17.9 * cm),
-        clockwise=True,
-        verbose=False,
-        steptype="Full",
-        initdelay=0.05,
-    )
-    motor_control.motor_move(**kwargs)
-    GPIO.output(PIN_ENABLE, GPIO.HIGH)
-    return kwargs
+async def run_motor(cm: int, wait: bool = True):
+    """Feed the paper by ``cm`` centimeters.
+
+    The move is queued and, unless ``wait`` is false, the response is sent once it is
+    complete. In any case, other requests are served while the motor is running.
+    """
+    job = motor_queue.submit(cm)
+    if wait:
+        await asyncio.wrap_future(job.future)
+    return job.as_dict()
+
+
+@app.get("/motor/jobs/")
+def list_motor_jobs():
+    return [job.as_dict() for job in motor_queue.jobs()]
+
+
+@app.get("/motor/jobs/{job_id}")
+def get_motor_job(job_id: int):
+    return _get_job(job_id).as_dict()
+
+
+@app.get("/motor/jobs/{job_id}/wait")
+async def wait_motor_job(job_id: int):
+    """Wait for a motor job to complete."""
+    job = _get_job(job_id)
+    await asyncio.wrap_future(job.future)
+    return job.as_dict()
 
 
 @app.on_event("shutdown")
 def shutdown_event():
-    GPIO.cleanup()
+    camera.close()
+    motor_queue.close()
@@ -0,0 +1,180 @@
+"""Paper feed motor drivers and job queue for the campi server.
+
+Motor moves are run as jobs on a dedicated thread, so that they don't hold any of the server's
+worker threads. The ``fake`` driver simulates the moves' duration and doesn't need any
+hardware, for testing the server off the Raspberry Pi.
+"""
+
+from __future__ import annotations
+
+import abc
+import concurrent.futures
+import dataclasses
+import enum
+import itertools
+import threading
+import time
+
+# Pins
+PIN_ENABLE = 5
+PIN_MS1 = 6
+PIN_MS2 = 13
+PIN_DIR = 26
+PIN_STEP = 19
+
+STEPS_PER_CM = 17.9
+STEP_DELAY = 0.005
+INIT_DELAY = 0.05
+
+
+class Motor(abc.ABC):
+    """Base class for motor drivers."""
+
+    @abc.abstractmethod
+    def move(self, steps: int) -> None:
+        """Feed the paper by ``steps`` motor steps, blocking until done."""
+
+    def close(self) -> None:
+        pass
+
+
+class RpiMotor(Motor):
+    """A3967 (EasyDriver) stepper driver, enabled only while moving."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        from RpiMotorLib import RpiMotorLib
+
+        self._gpio = GPIO
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(PIN_ENABLE, GPIO.OUT, initial=GPIO.HIGH)
+        GPIO.output(PIN_ENABLE, GPIO.HIGH)
+        self._motor = RpiMotorLib.A3967EasyNema(PIN_DIR, PIN_STEP, (PIN_MS1, PIN_MS2))
+
+    def move(self, steps: int) -> None:
+        self._gpio.output(PIN_ENABLE, self._gpio.LOW)
+        try:
+            self._motor.motor_move(
+                stepdelay=STEP_DELAY,
+                steps=steps,
+                clockwise=True,
+                verbose=False,
+                steptype="Full",
+                initdelay=INIT_DELAY,
+            )
+        finally:
+            self._gpio.output(PIN_ENABLE, self._gpio.HIGH)
+
+    def close(self) -> None:
+        self._gpio.cleanup()
+
+
+class FakeMotor(Motor):
+    """Simulated driver, which takes as long as the real motor to move."""
+
+    def __init__(self, step_delay: float = STEP_DELAY):
+        self.step_delay = step_delay
+        self.position = 0
+
+    def move(self, steps: int) -> None:
+        time.sleep(INIT_DELAY + steps * self.step_delay)
+        self.position += steps
+
+
+DRIVERS = {"rpi": RpiMotor, "fake": FakeMotor}
+
+
+def open_motor(driver: str) -> Motor:
+    try:
+        return DRIVERS[driver]()
+    except KeyError:
+        raise ValueError(
+            f"unknown motor driver '{driver}' (must be one of: {', '.join(DRIVERS)})"
+        ) from None
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclasses.dataclass
+class MotorJob:
+    id: int
+    cm: float
+    steps: int
+    status: JobStatus = JobStatus.QUEUED
+    error: str | None = None
+    submitted: float = dataclasses.field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    future: concurrent.futures.Future | None = dataclasses.field(default=None, repr=False)
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "cm": self.cm,
+            "steps": self.steps,
+            "status": self.status,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class MotorQueue:
+    """Run motor moves one after the other on a dedicated thread.
+
+    Each job's ``future`` completes when the move is finished.
+    """
+
+    def __init__(self, motor: Motor, history: int = 100):
+        self.motor = motor
+        self.history = history
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="motor")
+        self._jobs: dict[int, MotorJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _run(self, job: MotorJob) -> None:
+        job.status = JobStatus.RUNNING
+        job.started = time.time()
+        try:
+            self.motor.move(job.steps)
+        except Exception as exc:
+            job.status = JobStatus.FAILED
+            job.error = str(exc)
+            raise
+        else:
+            job.status = JobStatus.DONE
+        finally:
+            job.finished = time.time()
+
+    def submit(self, cm: float) -> MotorJob:
+        """Queue a paper feed of ``cm`` centimeters."""
+        with self._lock:
+            job = MotorJob(next(self._ids), cm, round(STEPS_PER_CM * cm))
+            # the future must exist before the job is published, as it may be awaited
+            job.future = self._executor.submit(self._run, job)
+            self._jobs[job.id] = job
+
+            # forget the oldest jobs
+            for job_id in list(self._jobs)[: -self.history]:
+                del self._jobs[job_id]
+
+        return job
+
+    def get(self, job_id: int) -> MotorJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[MotorJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.motor.close()
@@ -0,0 +1,103 @@
+"""In-process post-processing of the campi captures.
+
+Replaces the host-side ``convert -rotate R -crop WxH+X+Y -colorspace Gray -brightness-contrast
+BxC`` step, with the same parameter syntax and semantics, so that only the useful part of the
+picture is transferred.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import io
+import math
+import re
+
+from PIL import Image
+
+_GEOMETRY_RE = re.compile(r"^(\d+)x(\d+)([+-]\d+)([+-]\d+)$")
+_BRIGHTNESS_CONTRAST_RE = re.compile(r"^(-?\d+(?:\.\d*)?)(?:x(-?\d+(?:\.\d*)?))?$")
+
+_TRANSPOSE = {
+    90: Image.Transpose.ROTATE_270,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_90,
+}
+
+
+def parse_geometry(geometry: str) -> tuple[int, int, int, int]:
+    """Parse an ImageMagick ``WxH+X+Y`` geometry into a (left, top, right, bottom) box."""
+    match = _GEOMETRY_RE.match(geometry)
+    if match is None:
+        raise ValueError(f"invalid crop geometry '{geometry}' (expected WxH+X+Y)")
+    w, h, x, y = (int(v) for v in match.groups())
+    return x, y, x + w, y + h
+
+
+def parse_brightness_contrast(value: str) -> tuple[float, float]:
+    """Parse an ImageMagick ``BxC`` brightness/contrast specification (in percent)."""
+    match = _BRIGHTNESS_CONTRAST_RE.match(value)
+    if match is None:
+        raise ValueError(f"invalid brightness/contrast '{value}' (expected BxC)")
+    return float(match.group(1)), float(match.group(2) or 0)
+
+
+def brightness_contrast_lut(brightness: float, contrast: float) -> list[int]:
+    """Build the 8-bit lookup table of ImageMagick's ``-brightness-contrast``."""
+    slope = max(math.tan(math.pi * (contrast / 100 + 1) / 4), 0.0)
+    intercept = brightness / 100 + (100 - brightness) / 200 * (1 - slope)
+    return [min(255, max(0, round(255 * (slope * i / 255 + intercept)))) for i in range(256)]
+
+
+@dataclasses.dataclass(frozen=True)
+class Postprocess:
+    """Post-processing steps, applied in ImageMagick's order: rotate (clockwise, in multiples
+    of 90 degrees), crop, convert to grayscale, and adjust brightness/contrast."""
+
+    rotate: int = 0
+    crop: str | None = None
+    gray: bool = False
+    brightness_contrast: str | None = None
+
+    def __post_init__(self):
+        # validate early so that bad requests fail before capturing
+        if self.rotate % 90 != 0:
+            raise ValueError(f"rotation must be a multiple of 90 degrees, got {self.rotate}")
+        if self.crop is not None:
+            parse_geometry(self.crop)
+        if self.brightness_contrast is not None:
+            parse_brightness_contrast(self.brightness_contrast)
+
+    @property
+    def is_identity(self) -> bool:
+        return (
+            self.rotate % 360 == 0
+            and self.crop is None
+            and not self.gray
+            and self.brightness_contrast is None
+        )
+
+    def apply(self, img: Image.Image) -> Image.Image:
+        rotate = self.rotate % 360
+        if rotate:
+            img = img.transpose(_TRANSPOSE[rotate])
+
+        if self.crop is not None:
+            left, top, right, bottom = parse_geometry(self.crop)
+            img = img.crop(
+                (max(left, 0), max(top, 0), min(right, img.width), min(bottom, img.height))
+            )
+
+        if self.gray:
+            img = img.convert("L")
+
+        if self.brightness_contrast is not None:
+            lut = brightness_contrast_lut(*parse_brightness_contrast(self.brightness_contrast))
+            img = img.point(lut * len(img.getbands()))
+
+        return img
+
+
+def encode_jpeg(img: Image.Image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
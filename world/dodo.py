@@ -4,11 +4,17 @@ Details: https://bylr.info/articles/2022/12/22/automatic-plotloop-machine/
 """
 
 # requirements:
-# - imagemagick
 # - axicli
-# - librsvg (rsvg-convert)
+# - httpx
 
 import pathlib
+import sys
+
+PROJECT_DIR = pathlib.Path(__file__).parent
+sys.path.append(str(PROJECT_DIR.parent))
+
+import plotloop.tasks
+from plotloop import make_file_specs
 
 # parameters
 PAPER_ROLL_DISTANCE = 6
@@ -17,42 +23,59 @@ FRAME_COUNT = 280
 PIXELIZE = False
 
 PROJECT_NAME = "world"
+DATA_FILE = PROJECT_DIR / "World_Countries_(Generalized).geojson"
 BASENAME = f"{PROJECT_NAME}_frame_count_{FRAME_COUNT}_pixelize_{PIXELIZE}"
 
-PROJECT_DIR = pathlib.Path(__file__).parent
 VPYPE = PROJECT_DIR.parent / "venv/bin/vpype"
-AXICLI = f"ssh axidraw.local /home/pi/src/taxi/venv/bin/axicli -L 2 -d 37 -u 60 -N"
+AXIDRAW_HOST = "axidraw.local"
+AXICLI_REMOTE = "/home/pi/src/taxi/venv/bin/axicli -L 2 -d 37 -u 60 -N"
+AXICLI = f"ssh {AXIDRAW_HOST} {AXICLI_REMOTE}"
 CAMPI_SERVER = "http://campi.local:8000"
 
-
-class FileSpec:
-    def __init__(self, frame: int):
-        self.frame = frame
-        directory = PROJECT_DIR / "output"
-
-        # vsketch doesn't add zero padding to frame number
-        self.source = directory / (BASENAME + f"_frame_{self.frame}.svg")
-
-        # for the other file we add the zero padding to keep the order with CLI tools
-        base_frame = BASENAME + f"_frame_{self.frame:04d}"
-        self.simulated = directory / (base_frame + "_simulated.jpg")
-        self.plotted = directory / (base_frame + "_plotted.jpg")
-        self.postprocessed = directory / (base_frame + "_postprocessed.jpg")
-
-
-FILE_SPECS = {i: FileSpec(i) for i in range(1, FRAME_COUNT + 1)}
+# applied by the campi server to the pictures (see campi/postprocess.py), or locally by
+# the postprocess task
+POSTPROCESS = dict(rotate=270, crop="1900x1900+605+785", gray=True, brightness_contrast="5x15")
+
+# also download the unprocessed pictures, which the postprocess task needs (4x more data)
+KEEP_RAW = False
+
+# the postprocess task overwrites the plot task's pictures, so it must be run explicitly
+DOIT_CONFIG = {
+    "default_tasks": [
+        "generate",
+        "simulate",
+        "plot",
+        "animation",
+        "toggle",
+        "disable_xy",
+        "shutdown",
+    ]
+}
+
+# vsketch doesn't add zero padding to frame number, but for the other file we add the zero
+# padding to keep the order with CLI tools
+FILE_SPECS = make_file_specs(
+    PROJECT_DIR / "output",
+    range(1, FRAME_COUNT + 1),
+    source_name=BASENAME + "_frame_{frame}.svg",
+    base_name=BASENAME + "_frame_{frame:04d}",
+)
 
 
 def task_generate():
     """Generates golden master SVGs from the list of input files."""
     return {
         "actions": [
-            (
-                f"vsk save -n {PROJECT_NAME} -p frame_count {FRAME_COUNT} "
-                f"-p pixelize {PIXELIZE} -p frame 1..{FRAME_COUNT} -m ."
-            )
+            # equivalent to (but much faster than):
+            # vsk save -n world -p frame_count {FRAME_COUNT} -p pixelize {PIXELIZE}
+            #     -p frame 1..{FRAME_COUNT} -m .
+            f"{sys.executable} {PROJECT_DIR / 'render.py'} --frame-count {FRAME_COUNT}"
+            + (" --pixelize" if PIXELIZE else "")
+        ],
+        "file_dep": [
+            PROJECT_DIR / f"sketch_{PROJECT_NAME}.py",
+            PROJECT_DIR / "render.py",
         ],
-        "file_dep": [PROJECT_DIR / f"sketch_{PROJECT_NAME}.py"],
         "targets": list(spec.source for spec in FILE_SPECS.values()),
         "clean": True,
     }
@@ -62,32 +85,17 @@ def task_generate():
 # simulation tasks
 
 
-def task_simframe():
-    """Simulate a frame."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                # f"convert {spec.source} -scale 200x200 {spec.simulated}",
-                f"rsvg-convert -b white -h 200 {spec.source} > {spec.simulated}",
-            ],
-            "file_dep": [spec.source],
-            "targets": [spec.simulated],
-            "clean": True,
-        }
-
-
 def task_simulate():
     """Make the simulated animation."""
-    file_list = [spec.simulated for spec in FILE_SPECS.values()]
-    paths = " ".join(str(file) for file in file_list)
-    target = PROJECT_DIR / "output" / f"{BASENAME}.gif"
-    return {
-        "actions": [f"convert -delay 5 -loop 0 {paths} {target}"],
-        "file_dep": file_list,
-        "targets": [target],
-        "clean": True,
-    }
+    return plotloop.tasks.simulate_task(
+        FILE_SPECS,
+        PROJECT_DIR / f"sketch_{PROJECT_NAME}.py",
+        PROJECT_DIR / "output" / f"{BASENAME}.gif",
+        params={"frame_count": FRAME_COUNT, "pixelize": PIXELIZE},
+        # the world cache's version is defined in the sketch, which is hashed anyway
+        deps=[DATA_FILE],
+        pen_width="0.5mm",
+    )
 
 
 # -----------------------------------------------------------------------
@@ -95,52 +103,29 @@ def task_simulate():
 
 
 def task_plot():
-    """Plot the plotter-ready SVGs."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                f"cat {spec.source} | {AXICLI} -m plot",
-                f"{AXICLI} -m manual -M walk_y --walk_dist -3",
-                f"curl -s --output {spec.plotted} {CAMPI_SERVER}/img/?ev={EV_CORRECTION}",
-                f"{AXICLI} -m manual -M walk_y --walk_dist 3",
-                f"curl -s --output /dev/null {CAMPI_SERVER}/motor/{PAPER_ROLL_DISTANCE}",
-            ],
-            "file_dep": [spec.source],
-            "targets": [spec.plotted],
-            "clean": True,
-        }
+    """Plot the plotter-ready SVGs and capture the post-processed pictures."""
+    return plotloop.tasks.plot_task(
+        FILE_SPECS,
+        AXIDRAW_HOST,
+        AXICLI_REMOTE,
+        CAMPI_SERVER,
+        EV_CORRECTION,
+        PAPER_ROLL_DISTANCE,
+        POSTPROCESS,
+        keep_raw=KEEP_RAW,
+    )
 
 
 def task_postprocess():
-    """Post-process the plotted images."""
-    for frame, spec in FILE_SPECS.items():
-        yield {
-            "name": f"{frame:04d}",
-            "actions": [
-                (
-                    f"convert '{spec.plotted}' -rotate 270 -crop 1900x1900+605+785 "
-                    f"-colorspace Gray"
-                    f" -brightness-contrast 5x15 '{spec.postprocessed}'"
-                )
-            ],
-            "file_dep": [spec.plotted],
-            "targets": [spec.postprocessed],
-            "clean": True,
-        }
+    """Redo the post-processing of the plotted images locally (needs KEEP_RAW)."""
+    yield from plotloop.tasks.postprocess_tasks(FILE_SPECS, POSTPROCESS)
 
 
 def task_animation():
     """Make the animation."""
-    file_list = [spec.postprocessed for spec in FILE_SPECS.values()]
-    paths = " ".join(str(file) for file in file_list)
-    target = PROJECT_DIR / "output" / f"{BASENAME}_final.gif"
-    return {
-        "actions": [f"convert -resize 28%% -delay 5 -loop 0 {paths} {target}"],
-        "file_dep": file_list,
-        "targets": [target],
-        "clean": True,
-    }
+    return plotloop.tasks.animation_task(
+        FILE_SPECS, PROJECT_DIR / "output" / f"{BASENAME}_final.gif", scale=0.28
+    )
 
 
 # -----------------------------------------------------------------------
@@ -149,12 +134,12 @@ def task_animation():
 
 def task_toggle():
     """Toggle pen up/down"""
-    return {"actions": [f"{AXICLI} -m toggle"]}
+    return plotloop.tasks.toggle_task(AXICLI)
 
 
 def task_disable_xy():
     """Disable X/Y motors"""
-    return {"actions": [f"{AXICLI} -m manual -M disable_xy"]}
+    return plotloop.tasks.disable_xy_task(AXICLI)
 
 
 def task_shutdown():
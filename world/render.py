@@ -0,0 +1,111 @@
+"""Batch renderer for the world sketch. This is part of the Automatic #plotloop Machine
+project.
+
+Contrary to ``vsk save -p frame 1..N``, which reloads the sketch (and thus the world data)
+for every single frame, the world data is loaded once, the rotation matrices of all frames
+are computed in one go, and the frames are then rendered by a pool of worker processes. The
+output file names match those of ``vsk save``.
+
+Usage:
+
+    python render.py [--frame-count 280] [--pixelize] [--processes 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import Any
+
+import numpy as np
+import vpype as vp
+from multiprocess import Pool
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+
+from sketch_world import WorldSketch, frame_angles, rotation_matrices
+
+PROJECT_NAME = "world"
+OUTPUT_DIR = pathlib.Path(__file__).parent / "output"
+
+
+def output_path(frame: int, frame_count: int, pixelize: bool) -> pathlib.Path:
+    """Output path for a frame, matching ``vsk save -p frame_count ... -p pixelize ...
+    -p frame ...``."""
+    return OUTPUT_DIR / (
+        f"{PROJECT_NAME}_frame_count_{frame_count}_pixelize_{pixelize}_frame_{frame}.svg"
+    )
+
+
+def render_frame(
+    frame: int, rot: np.ndarray, path: pathlib.Path, params: dict[str, Any]
+) -> tuple[float, int, int]:
+    """Render a single frame to ``path`` and return the time it took along with the number of
+    culled and drawn polygons.
+
+    The sketch parameters are set here rather than by the caller, as worker processes which
+    are spawned (rather than forked) import the sketch afresh, with its default parameters.
+    """
+
+    start = time.perf_counter()
+
+    WorldSketch.set_param_set(params)
+    sketch = WorldSketch()
+    sketch.draw_rotated(sketch.vsk, rot)
+    sketch.ensure_finalized()
+
+    with open(path, "w") as fp:
+        vp.write_svg(
+            fp,
+            sketch.vsk.document,
+            source_string=f"render.py (frame {frame})",
+            use_svg_metadata=True,
+        )
+
+    return time.perf_counter() - start, sketch.culled_count, sketch.drawn_count
+
+
+def render_frames(
+    frames: np.ndarray, frame_count: int, pixelize: bool, processes: int | None = None
+) -> None:
+    params = {"mode": "frame", "frame_count": frame_count, "pixelize": pixelize}
+    rots = rotation_matrices(*frame_angles(frames, frame_count))
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    jobs = [
+        (int(frame), rot, output_path(int(frame), frame_count, pixelize), params)
+        for frame, rot in zip(frames, rots)
+    ]
+
+    start = time.perf_counter()
+    with Pool(processes) as p:
+        for (frame, _, path, _), (elapsed, culled, drawn) in zip(
+            jobs, p.imap(lambda job: render_frame(*job), jobs)
+        ):
+            print(
+                f"frame {frame:4d}: {elapsed * 1000:7.1f}ms  "
+                f"{culled:5d} culled, {drawn:5d} drawn  {path.name}"
+            )
+    total = time.perf_counter() - start
+
+    print(f"rendered {len(jobs)} frames in {total:.2f}s ({len(jobs) / total:.1f} fps)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all frames of the world sketch.")
+    parser.add_argument("--frame-count", type=int, default=280)
+    parser.add_argument("--pixelize", action="store_true")
+    parser.add_argument(
+        "--frames", type=str, default=None, help="frame range, e.g. 1..280 (default: all)"
+    )
+    parser.add_argument("--processes", "-j", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.frames is None:
+        first, last = 1, args.frame_count
+    else:
+        first, last = (int(s) for s in args.frames.split(".."))
+
+    render_frames(np.arange(first, last + 1), args.frame_count, args.pixelize, args.processes)
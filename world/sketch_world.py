@@ -5,8 +5,11 @@ Details: https://bylr.info/articles/2022/12/22/automatic-plotloop-machine/
 
 from __future__ import annotations
 
+import dataclasses
+import hashlib
 import json
 import math
+import os
 import pathlib
 import warnings
 
@@ -23,6 +26,21 @@ warnings.filterwarnings("ignore", category=shapely_warning)
 # downloaded from: https://hub.arcgis.com/datasets/esri::world-countries-generalized/about
 DATA_FILE = pathlib.Path(__file__).parent / "World_Countries_(Generalized).geojson"
 
+# projected geometry is cached here, see load_world()
+CACHE_DIR = pathlib.Path(__file__).parent / ".cache"
+CACHE_VERSION = 2
+
+# polygons smaller than this (in m²) are discarded
+AREA_THRESHOLD = 1e9
+
+# simplification tolerances (in unit sphere radius) of the precomputed level-of-detail tiers
+LOD_TOLERANCES = (0.0, 0.0005, 0.001, 0.002)
+
+# output scale, used to pick the LOD tier (the sketch is simplified to SIMPLIFY_TOLERANCE
+# anyway)
+GLOBE_RADIUS = "2cm"
+SIMPLIFY_TOLERANCE = "0.07mm"
+
 
 def polygon_area(lats, lons, radius=6378137):
     """
@@ -68,16 +86,13 @@ def polygon_area(lats, lons, radius=6378137):
         return area
 
 
-def project_polygon(p: Polygon) -> np.ndarray | None:
-    coords = np.array(p.exterior.coords)
+def project_coords(coords: np.ndarray) -> np.ndarray:
+    """Project (lon, lat) coordinates (in degrees) onto the unit sphere."""
     vectors = np.zeros(shape=(len(coords), 3))
 
     lats = np.deg2rad(coords[:, 1])
     lons = np.deg2rad(coords[:, 0])
 
-    if polygon_area(lats, lons) < 1000000000:
-        return None
-
     # apply latitude
     vectors[:, 0] = np.cos(lats)
     vectors[:, 2] = np.sin(lats)
@@ -93,7 +108,115 @@ def project_polygon(p: Polygon) -> np.ndarray | None:
     return vectors_final
 
 
-def build_world() -> list[np.ndarray]:
+def exterior_area(p: Polygon) -> float:
+    """Spherical area of a (lon, lat) polygon's exterior, in m²."""
+    coords = np.array(p.exterior.coords)
+    return polygon_area(np.deg2rad(coords[:, 1]), np.deg2rad(coords[:, 0]))
+
+
+def project_polygon(p: Polygon, min_area: float = AREA_THRESHOLD) -> np.ndarray | None:
+    if exterior_area(p) < min_area:
+        return None
+
+    return project_coords(np.array(p.exterior.coords))
+
+
+def simplify_polygon(p: Polygon, tolerance: float) -> Polygon:
+    """Simplify a (lon, lat) polygon's exterior, with a tolerance expressed in unit sphere
+    radius.
+
+    Simplification is done in (lon, lat) space, where distances are never smaller than on the
+    sphere, so the actual error is at most ``tolerance``."""
+
+    exterior = Polygon(p.exterior)
+    if tolerance == 0:
+        return exterior
+
+    simplified = exterior.simplify(math.degrees(tolerance), preserve_topology=True)
+    if simplified.is_empty or len(simplified.exterior.coords) < 4:
+        return exterior
+    return simplified
+
+
+@dataclasses.dataclass(frozen=True)
+class Lines:
+    """Ragged collection of 3D lines, stored as a single (N, 3) coordinate array.
+
+    Line ``i`` spans ``coords[offsets[i]:offsets[i + 1]]``.
+    """
+
+    coords: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_list(cls, lines: list[np.ndarray]) -> Lines:
+        return cls(np.vstack(lines), np.cumsum([0] + [len(line) for line in lines]))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        if len(self) == 0:
+            return iter([])
+
+        # np.split() returns views, no coordinate is copied
+        return iter(np.split(self.coords, self.offsets[1:-1]))
+
+    def rotate(self, rot: np.ndarray) -> Lines:
+        """Apply a 3x3 rotation matrix to all lines at once."""
+        return Lines(self.coords @ rot.T, self.offsets)
+
+    def select(self, mask: np.ndarray) -> Lines:
+        """Return the subset of lines for which ``mask`` is true."""
+        lengths = np.diff(self.offsets)
+        return Lines(
+            self.coords[np.repeat(mask, lengths)],
+            np.hstack([0, np.cumsum(lengths[mask])]),
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class Caps:
+    """Bounding caps of a collection of lines on the unit sphere.
+
+    Every point of line ``i`` is within an angle of ``radii[i]`` of the direction
+    ``centers[i]``.
+    """
+
+    centers: np.ndarray
+    radii: np.ndarray
+
+    @classmethod
+    def from_lines(cls, lines: Lines) -> Caps:
+        starts = lines.offsets[:-1]
+        centers = np.add.reduceat(lines.coords, starts)
+        centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+        point_centers = np.repeat(centers, np.diff(lines.offsets), axis=0)
+        cos_angles = np.sum(lines.coords * point_centers, axis=1)
+        radii = np.maximum.reduceat(np.arccos(np.clip(cos_angles, -1.0, 1.0)), starts)
+
+        # safety margin for round-off errors
+        return cls(centers, radii + 1e-9)
+
+    def select(self, mask: np.ndarray) -> Caps:
+        return Caps(self.centers[mask], self.radii[mask])
+
+    def max_projection(self, axis: np.ndarray) -> np.ndarray:
+        """Upper bound of the projection of each line's points on the unit vector ``axis``."""
+        angles = np.arccos(np.clip(self.centers @ axis, -1.0, 1.0))
+        return np.cos(np.maximum(angles - self.radii, 0.0))
+
+
+def build_world(
+    tolerances: tuple[float, ...] = LOD_TOLERANCES,
+) -> tuple[np.ndarray, list[Lines]]:
+    """Build the projected world geometry.
+
+    Returns the area (in m²) of every polygon, along with one :class:`Lines` per tolerance in
+    ``tolerances``, each containing the same polygons simplified to that tolerance.
+    """
+
     with open(DATA_FILE) as fp:
         data = json.load(fp)
 
@@ -109,16 +232,80 @@ def build_world() -> list[np.ndarray]:
         + [shape(country["geometry"]) for country in data["features"]]
     )
 
-    lines = []
-    for p in world.geoms:
-        projected = project_polygon(p)
-        if projected is not None:
-            lines.append(projected)
+    areas = np.array([exterior_area(p) for p in world.geoms])
+    tiers = [
+        Lines.from_list(
+            [
+                project_coords(np.array(simplify_polygon(p, tolerance).exterior.coords))
+                for p in world.geoms
+            ]
+        )
+        for tolerance in tolerances
+    ]
+
+    return areas, tiers
+
+
+def _cache_path() -> pathlib.Path:
+    """Cache file name, keyed on the data file content, the LOD tolerances and the cache
+    format version."""
+    digest = hashlib.sha256(DATA_FILE.read_bytes())
+    digest.update(repr((LOD_TOLERANCES, CACHE_VERSION)).encode())
+    return CACHE_DIR / f"world_{digest.hexdigest()[:16]}.npz"
 
-    return lines
 
+def _load_tiers() -> tuple[np.ndarray, list[tuple[Lines, Caps]]]:
+    path = _cache_path()
 
-LINES = build_world()
+    if path.exists():
+        with np.load(path) as data:
+            return data["areas"], [
+                (
+                    Lines(data[f"coords_{i}"], data[f"offsets_{i}"]),
+                    Caps(data[f"centers_{i}"], data[f"radii_{i}"]),
+                )
+                for i in range(len(LOD_TOLERANCES))
+            ]
+
+    areas, tier_lines = build_world()
+    tiers = [(lines, Caps.from_lines(lines)) for lines in tier_lines]
+
+    # write to a temporary file first, as several `vsk save -m` processes may race here
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}_{os.getpid()}.tmp.npz")
+    arrays = {"areas": areas}
+    for i, (lines, caps) in enumerate(tiers):
+        arrays[f"coords_{i}"] = lines.coords
+        arrays[f"offsets_{i}"] = lines.offsets
+        arrays[f"centers_{i}"] = caps.centers
+        arrays[f"radii_{i}"] = caps.radii
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+    return areas, tiers
+
+
+def load_world(min_area: float = AREA_THRESHOLD, tolerance: float = 0.0) -> tuple[Lines, Caps]:
+    """Load the projected world lines and their bounding caps, using the on-disk cache when
+    available.
+
+    The union and projection done by :func:`build_world` are slow, and this module is loaded
+    once per frame by ``vsk save``. The result is thus stored as flat coordinate buffers plus
+    line offsets, so only the first run pays for it.
+
+    Polygons smaller than ``min_area`` (in m²) are discarded, and the coarsest LOD tier whose
+    tolerance (in unit sphere radius) doesn't exceed ``tolerance`` is used.
+    """
+
+    areas, tiers = _load_tiers()
+    lines, caps = tiers[max(i for i, tol in enumerate(LOD_TOLERANCES) if tol <= tolerance)]
+    mask = areas >= min_area
+    return lines.select(mask), caps.select(mask)
+
+
+LINES, CAPS = load_world(
+    tolerance=vp.convert_length(SIMPLIFY_TOLERANCE) / vp.convert_length(GLOBE_RADIUS)
+)
 
 
 def _interpolate_crop(
@@ -214,6 +401,141 @@ def crop_half_plane(
     return line_arr
 
 
+def _interpolate_crop_batch(
+    start: np.ndarray, stop: np.ndarray, loc: float, axis: int
+) -> np.ndarray:
+    """Vectorized version of :func:`_interpolate_crop` for (K, M) arrays of points."""
+
+    r = ((loc - start[:, axis]) / (stop[:, axis] - start[:, axis])).reshape(-1, 1)
+    return np.where(r < 0.5, start + (stop - start) * r, stop - (stop - start) * (1.0 - r))
+
+
+def crop_half_plane_batch(lines: Lines, loc: float, axis: int, keep_smaller: bool) -> Lines:
+    """Vectorized version of :func:`crop_half_plane` operating on all lines at once.
+
+    The output is identical to applying :func:`crop_half_plane` to each line in turn and
+    concatenating the results.
+    """
+
+    coords, offsets = lines.coords, lines.offsets
+    if axis not in range(coords.shape[1]):
+        raise ValueError(f"invalid crop axis {axis}")
+
+    if keep_smaller:
+        outside = coords[:, axis] > loc
+    else:
+        outside = coords[:, axis] < loc
+    inside = ~outside
+
+    n = len(coords)
+    first = np.zeros(n, dtype=bool)
+    first[offsets[:-1]] = True
+    last = np.zeros(n, dtype=bool)
+    last[offsets[1:] - 1] = True
+
+    # Streaks of kept points, which never span multiple lines. Lines that are entirely kept
+    # yield a single streak without crossing, and lines that are entirely cropped yield none.
+    (streak_start,) = np.nonzero(inside & (first | np.roll(outside, 1)))
+    (streak_stop,) = np.nonzero(inside & (last | np.roll(outside, -1)))
+    has_pre = ~first[streak_start]
+    has_post = ~last[streak_stop]
+    crossed = has_pre | has_post
+
+    pre = _interpolate_crop_batch(
+        coords[streak_start[has_pre] - 1], coords[streak_start[has_pre]], loc, axis
+    )
+    post = _interpolate_crop_batch(
+        coords[streak_stop[has_post]], coords[streak_stop[has_post] + 1], loc, axis
+    )
+
+    # assemble the sub-lines: [pre] + kept points + [post]
+    lengths = has_pre + (streak_stop - streak_start + 1) + has_post
+    sub_offsets = np.hstack([0, np.cumsum(lengths)])
+    pre_pos = sub_offsets[:-1][has_pre]
+    post_pos = sub_offsets[1:][has_post] - 1
+
+    src = np.empty(sub_offsets[-1], dtype=int)
+    is_kept_point = np.ones(len(src), dtype=bool)
+    is_kept_point[pre_pos] = False
+    is_kept_point[post_pos] = False
+    (src[is_kept_point],) = np.nonzero(inside)
+    src[pre_pos] = n + np.arange(len(pre))
+    src[post_pos] = n + len(pre) + np.arange(len(post))
+    sub_coords = np.vstack([coords, pre, post])[src]
+
+    # check cases where coordinate lie on threshold (crossed streaks have at least 2 points)
+    sub_start = sub_offsets[:-1].copy()
+    sub_stop = sub_offsets[1:].copy()
+    cs, ce = sub_start[crossed], sub_stop[crossed]
+    sub_start[crossed] += np.all(sub_coords[cs] == sub_coords[cs + 1], axis=1)
+    sub_stop[crossed] -= np.all(sub_coords[ce - 1] == sub_coords[ce - 2], axis=1)
+    keep = ~crossed | (sub_stop >= sub_start + 2)
+    sub_start, sub_stop = sub_start[keep], sub_stop[keep]
+
+    # gather the kept ranges
+    mask = np.zeros(len(sub_coords) + 1, dtype=int)
+    np.add.at(mask, sub_start, 1)
+    np.add.at(mask, sub_stop, -1)
+    return Lines(
+        sub_coords[np.cumsum(mask[:-1]) > 0],
+        np.hstack([0, np.cumsum(sub_stop - sub_start)]),
+    )
+
+
+def frame_angles(frame, frame_count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute the X, Y, Z rotation angles (in degrees) of one or more animation frames."""
+
+    frame = np.asarray(frame, dtype=float)
+
+    # begin and end at home (Lausanne, Switzerland)
+    start_z = -6.6
+    start_y = 46.5
+
+    rot_x_angle = 360 * frame / frame_count
+    # rot_y_angle = 720 * frame / frame_count
+    rot_y_angle = start_y + np.sin(frame / frame_count * 2 * math.pi) * 360
+    rot_z_angle = start_z + 2 * 360 * frame / frame_count
+
+    return rot_x_angle, rot_y_angle, rot_z_angle
+
+
+def rotation_matrices(rot_x_angle, rot_y_angle, rot_z_angle) -> np.ndarray:
+    """Build the (F, 3, 3) stack of rotation matrices ``rot_x @ rot_y @ rot_z`` for F sets of
+    angles (in degrees)."""
+
+    ax, ay, az = np.broadcast_arrays(
+        *(np.deg2rad(np.atleast_1d(a)) for a in (rot_x_angle, rot_y_angle, rot_z_angle))
+    )
+    zeros = np.zeros_like(ax)
+    ones = np.ones_like(ax)
+
+    def _stack(rows):
+        return np.stack([np.stack(row, axis=-1) for row in rows], axis=-2)
+
+    rot_x = _stack(
+        [
+            (ones, zeros, zeros),
+            (zeros, np.cos(ax), -np.sin(ax)),
+            (zeros, np.sin(ax), np.cos(ax)),
+        ]
+    )
+    rot_y = _stack(
+        [
+            (np.cos(ay), zeros, np.sin(ay)),
+            (zeros, ones, zeros),
+            (-np.sin(ay), zeros, np.cos(ay)),
+        ]
+    )
+    rot_z = _stack(
+        [
+            (np.cos(az), -np.sin(az), zeros),
+            (np.sin(az), np.cos(az), zeros),
+            (zeros, zeros, ones),
+        ]
+    )
+    return rot_x @ rot_y @ rot_z
+
+
 class WorldSketch(vsketch.SketchClass):
     # Sketch parameters:
     mode = vsketch.Param("frame", choices=["manual", "frame"])
@@ -227,63 +549,57 @@ class WorldSketch(vsketch.SketchClass):
     pixelize = vsketch.Param(False)
     pen_width = vsketch.Param(0.5, unit="mm", step=0.05)
 
-    def draw(self, vsk: vsketch.Vsketch) -> None:
-        vsk.size("5x5cm", landscape=False, center=False)
+    def __init__(self):
+        super().__init__()
 
-        vsk.scale("2cm")
-        vsk.translate(1.25, 1.25)
+        # polygon counts of the last drawn frame, reported by render.py
+        self.culled_count = 0
+        self.drawn_count = 0
 
+    def rotation(self) -> np.ndarray:
+        """Rotation matrix for the current parameters."""
         if self.mode == "manual":
-            rot_x_angle, rot_y_angle, rot_z_angle = self.rot_x, self.rot_y, self.rot_z
+            angles = self.rot_x, self.rot_y, self.rot_z
         elif self.mode == "frame":
-            # begin and end at home (Lausanne, Switzerland)
-            start_z = -6.6
-            start_y = 46.5
-
-            rot_x_angle = 360 * self.frame / self.frame_count
-            # rot_y_angle = 720 * self.frame / self.frame_count
-            rot_y_angle = start_y + math.sin(self.frame / self.frame_count * 2 * math.pi) * 360
-            rot_z_angle = start_z + 2 * 360 * self.frame / self.frame_count
+            angles = frame_angles(self.frame, self.frame_count)
         else:
             raise ValueError(f"unknown mode {self.mode}")
 
-        rot_x = np.array(
-            [
-                (1, 0, 0),
-                (0, math.cos(math.radians(rot_x_angle)), -math.sin(math.radians(rot_x_angle))),
-                (0, math.sin(math.radians(rot_x_angle)), math.cos(math.radians(rot_x_angle))),
-            ]
-        )
-        rot_y = np.array(
-            [
-                (math.cos(math.radians(rot_y_angle)), 0, math.sin(math.radians(rot_y_angle))),
-                (0, 1, 0),
-                (-math.sin(math.radians(rot_y_angle)), 0, math.cos(math.radians(rot_y_angle))),
-            ]
-        )
-        rot_z = np.array(
-            [
-                (math.cos(math.radians(rot_z_angle)), -math.sin(math.radians(rot_z_angle)), 0),
-                (math.sin(math.radians(rot_z_angle)), math.cos(math.radians(rot_z_angle)), 0),
-                (0, 0, 1),
-            ]
-        )
-        rot = rot_x @ rot_y @ rot_z
+        return rotation_matrices(*angles)[0]
+
+    def draw(self, vsk: vsketch.Vsketch) -> None:
+        self.draw_rotated(vsk, self.rotation())
+
+    def draw_rotated(self, vsk: vsketch.Vsketch, rot: np.ndarray) -> None:
+        """Draw the globe for a given rotation matrix.
 
-        for line in LINES:
+        This is split from :meth:`draw` so that ``render.py`` can provide precomputed
+        rotations."""
+
+        vsk.size("5x5cm", landscape=False, center=False)
 
-            rotated_line = (rot @ line.T).T
+        vsk.scale(GLOBE_RADIUS)
+        vsk.translate(1.25, 1.25)
+
+        # Back-face culling: the first row of the rotation matrix is the crop axis in world
+        # coordinates, so polygons whose cap lies entirely behind the crop plane are skipped.
+        visible = CAPS.max_projection(rot[0]) >= self.crop_depth
+        cropped_lines = crop_half_plane_batch(
+            LINES.select(visible).rotate(rot), self.crop_depth, axis=0, keep_smaller=False
+        )
+        self.drawn_count = int(np.count_nonzero(visible))
+        self.culled_count = len(LINES) - self.drawn_count
 
-            for cropped_line in crop_half_plane(
-                rotated_line, self.crop_depth, axis=0, keep_smaller=False
-            ):
-                vsk.polygon(cropped_line[:, 1], -cropped_line[:, 2])
+        for cropped_line in cropped_lines:
+            vsk.polygon(cropped_line[:, 1], -cropped_line[:, 2])
 
         if self.circle:
             vsk.circle(0, 0, radius=1)
             if self.pixelize:
                 # thicken the circle for a better pixelated look
-                vsk.circle(0, 0, radius=1 + self.pen_width / vp.convert_length("2cm") / 9)
+                vsk.circle(
+                    0, 0, radius=1 + self.pen_width / vp.convert_length(GLOBE_RADIUS) / 9
+                )
 
         if self.pixelize:
             vsk.vpype(
@@ -291,7 +607,7 @@ class WorldSketch(vsketch.SketchClass):
                 f"linemerge --tolerance {self.pen_width + 0.1}"
             )
         else:
-            vsk.vpype("linesimplify -t 0.07mm")
+            vsk.vpype(f"linesimplify -t {SIMPLIFY_TOLERANCE}")
 
     def finalize(self, vsk: vsketch.Vsketch) -> None:
         if self.pixelize: